@@ -0,0 +1,168 @@
+'''
+Benchmarks of dsgrn_net_gen.networksearch.perturbNetwork on fixed seeds and canonical parameter sets.
+
+Usage:
+
+    python bench_search.py [--output results.json] [--baseline baseline.json] [--tolerance 0.1] [--repeat 3]
+                           [--scale 1.0] [--case NAME ...]
+
+Each case runs in a fresh process, so that caches are cold and the peak memory belongs to that case alone. The
+results are written as JSON; with --baseline, the candidates per second of each case are compared with a stored
+results file and the exit status is 1 if any case is slower than the baseline by more than the tolerance.
+'''
+
+import argparse, json, multiprocessing, platform, resource, sys, time
+from copy import deepcopy
+
+SMALL_SEED = "X1 : (X1)(~X3)\nX2 : X1\nX3 : X1 + X2"
+
+LARGE_SEED = "\n".join(["X1 : (~X8)", "X2 : (X1)", "X3 : (X2)(~X5)", "X4 : (X3)", "X5 : (X4)", "X6 : (X5)(~X2)",
+                        "X7 : (X6)", "X8 : (X7 + X4)"])
+
+# the edge and node files of tests/params_X1X2X3_A.json
+SMALL_EDGES = [("X2","X2","a"), ("X3","X2","a"), ("X1","X2","r"), ("X3","X2","r"), ("X3","X3","a"), ("X4","X1","a"),
+               ("X4","X2","a"), ("X5","X1","r"), ("X5","X2","r"), ("X5","X4","a"), ("X5","X4","r"), ("X4","X5","a"),
+               ("X4","X5","r"), ("X1","X4","a"), ("X2","X4","r"), ("X3","X5","a"), ("X3","X5","r")]
+SMALL_NODES = ["X4", "X5"]
+
+# each node of the large seed may regulate the next two nodes either way, and two new nodes join the cycle
+LARGE_EDGES = [("X{}".format(i), "X{}".format((i + k) % 8 + 1), reg) for i in range(1, 9) for k in (1, 2)
+               for reg in "ar"] + [("X9","X1","a"), ("X9","X5","r"), ("X10","X3","a"), ("X4","X10","a"),
+                                   ("X8","X9","a"), ("X10","X9","r")]
+LARGE_NODES = ["X9", "X10"]
+
+BASE = {"probabilities" : {"addNode" : 0.1, "addEdge" : 0.5, "removeEdge" : 0.3, "removeNode" : 0.1},
+        "range_operations" : [1, 4], "maxparams" : 100000, "time_to_wait" : 120, "random_seed" : 20200909,
+        "compressed_output" : True}
+
+# is_feed_forward is left out, since both seeds have cycles that a few operations rarely remove
+FILTERS = {
+    "none" : {},
+    "connected" : {"is_connected" : {}},
+    "strongly_connected" : {"is_strongly_connected" : {}},
+    "degrees" : {"constrained_inedges" : {"min_inedges" : 1, "max_inedges" : 3},
+                 "constrained_outedges" : {"min_outedges" : 1, "max_outedges" : 3}},
+    "all" : {"is_connected" : {}, "is_strongly_connected" : {},
+             "constrained_inedges" : {"min_inedges" : 1, "max_inedges" : 3},
+             "constrained_outedges" : {"min_outedges" : 1, "max_outedges" : 3}},
+}
+
+
+def make_cases():
+    # name -> (seed network spec, parameters)
+    cases = {}
+    for size, seed, edges, nodes, numneighbors in [("small", SMALL_SEED, SMALL_EDGES, SMALL_NODES, 50),
+                                                   ("large", LARGE_SEED, LARGE_EDGES, LARGE_NODES, 100)]:
+        for constraint in ["unconstrained", "edgefile"]:
+            for name, filters in FILTERS.items():
+                params = deepcopy(BASE)
+                params["numneighbors"] = numneighbors
+                params["filters"] = filters
+                if constraint == "edgefile":
+                    params["edgelist"] = list(edges)
+                    params["nodelist"] = list(nodes)
+                cases["{}_{}_{}".format(size, constraint, name)] = (seed, params)
+    return cases
+
+
+def run_case(seed, params, results):
+    # runs in a fresh process
+    import dsgrn_net_gen.networksearch as networksearch
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stats = {}
+    networksearch.perturbNetwork(params, seed, stats=stats)
+    stats["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    stats["rss_growth_kb"] = stats["peak_rss_kb"] - rss_before
+    results.put(stats)
+
+
+def measure(seed, params, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        results = ctx.Queue()
+        proc = ctx.Process(target=run_case, args=(seed, params, results))
+        proc.start()
+        runs.append(results.get())
+        proc.join()
+    # the run with the median time stands for the case
+    runs.sort(key=lambda run: run["elapsed"])
+    run = runs[len(runs) // 2]
+    elapsed = max(run["elapsed"], 1e-9)
+    result = {"perturbed" : run["perturbed"], "accepted" : run["accepted"], "elapsed" : run["elapsed"],
+              "elapsed_runs" : [r["elapsed"] for r in runs],
+              "candidates_per_second" : run["perturbed"] / elapsed, "accepted_per_second" : run["accepted"] / elapsed,
+              "warnings" : run["warnings"], "peak_rss_kb" : max(r["peak_rss_kb"] for r in runs),
+              "rss_growth_kb" : max(r["rss_growth_kb"] for r in runs), "stages" : {}}
+    for name, stage in run["stages"].items():
+        result["stages"][name] = dict(stage, time_per_call=stage["time"] / max(stage["calls"], 1))
+    return result
+
+
+def environment():
+    try:
+        from importlib.metadata import version
+        dsgrn = version("DSGRN")
+    except Exception:
+        dsgrn = None
+    return {"python" : platform.python_version(), "platform" : platform.platform(), "machine" : platform.machine(),
+            "DSGRN" : dsgrn, "date" : time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def compare(results, baseline, tolerance):
+    # returns the names of the cases that are slower than the baseline by more than the tolerance
+    regressions = []
+    print("\n{:<40}{:>14}{:>14}{:>9}".format("case", "baseline c/s", "c/s", "ratio"))
+    for name, result in results["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        old = baseline["cases"][name]["candidates_per_second"]
+        new = result["candidates_per_second"]
+        ratio = new / old if old else float("inf")
+        flag = ""
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+            flag = "  slower"
+        print("{:<40}{:>14.1f}{:>14.1f}{:>9.2f}{}".format(name, old, new, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark networksearch.perturbNetwork.")
+    parser.add_argument("--output", default="benchmark_results.json", help="file for the JSON results")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed fractional slowdown in candidates per second, default 0.1")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the median is reported, default 3")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of networks per case")
+    parser.add_argument("--case", nargs="*", help="names of the cases to run, default all")
+    args = parser.parse_args(argv)
+
+    cases = make_cases()
+    if args.case:
+        unknown = set(args.case).difference(cases)
+        if unknown:
+            parser.error("unknown cases {}; choose from {}".format(sorted(unknown), sorted(cases)))
+        cases = {name : cases[name] for name in args.case}
+
+    results = {"environment" : environment(), "settings" : {"repeat" : args.repeat, "scale" : args.scale},
+               "cases" : {}}
+    for name, (seed, params) in cases.items():
+        params["numneighbors"] = max(1, int(params["numneighbors"] * args.scale))
+        result = measure(seed, params, args.repeat)
+        results["cases"][name] = result
+        print("{:<40}{:>10.1f} candidates/s{:>10.1f} accepted/s{:>10d} kB".format(
+            name, result["candidates_per_second"], result["accepted_per_second"], result["peak_rss_kb"]))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
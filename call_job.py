@@ -1,7 +1,10 @@
 from dsgrn_net_gen.makejobs import Job
 import sys
 
-paramfile = sys.argv[1]
-job = Job(paramfile)
+if sys.argv[1] == "--resume":
+    # continue an interrupted job from the checkpoint in its results directory
+    job = Job.resume(sys.argv[2])
+else:
+    paramfile = sys.argv[1]
+    job = Job(paramfile)
 job.run()
-
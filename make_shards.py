@@ -0,0 +1,7 @@
+from dsgrn_net_gen.sharding import make_shards
+import sys
+
+# split a job into shards, each run with call_job.py <shardsdir>/shard<k>/params.json
+paramfile, nshards, shardsdir = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+for paramfile in make_shards(paramfile, nshards, shardsdir):
+    print(paramfile)
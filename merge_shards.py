@@ -0,0 +1,7 @@
+from dsgrn_net_gen.sharding import merge_shards
+import sys
+
+# combine the results of finished shards into <shardsdir>/merged
+shardsdir = sys.argv[1]
+stats = merge_shards(shardsdir, collapse_isomorphic="--collapse-isomorphic" in sys.argv[2:])
+print("Merged {} networks from {} shards, {} duplicates dropped.".format(stats["networks"], len(stats["shards"]), stats["duplicates"]))
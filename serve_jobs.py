@@ -0,0 +1,9 @@
+from dsgrn_net_gen.server import serve, DEFAULT_SOCKET
+import argparse
+
+# keep DSGRN and the caches warm and run the jobs sent by submit_job.py
+parser = argparse.ArgumentParser(description="Run dsgrn_net_gen jobs sent over a Unix socket.")
+parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path of the Unix socket")
+parser.add_argument("--workers", type=int, default=None, help="number of jobs that run at once, default = number of CPUs")
+args = parser.parse_args()
+serve(args.socket, args.workers)
@@ -5,7 +5,7 @@ setup(
     version='0.0.1',
     package_dir={'':'src'},
     packages = ['dsgrn_net_gen'],
-    install_requires=["networkx","DSGRN"],
+    install_requires=["DSGRN"],
     author="Bree Cummins",
     url='https://github.com/breecummins/dsgrn_net_gen'
     )
\ No newline at end of file
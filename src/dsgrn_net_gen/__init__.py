@@ -2,5 +2,24 @@ import dsgrn_net_gen.fileparsers
 import dsgrn_net_gen.makejobs
 import dsgrn_net_gen.networksearch
 import dsgrn_net_gen.filters
+import dsgrn_net_gen.parallel
+import dsgrn_net_gen.paramcache
+import dsgrn_net_gen.paramcount
+import dsgrn_net_gen.fingerprint
+import dsgrn_net_gen.workgraph
+import dsgrn_net_gen.filterchain
+import dsgrn_net_gen.results
+import dsgrn_net_gen.checkpoint
+import dsgrn_net_gen.scheduler
+import dsgrn_net_gen.instrumentation
+import dsgrn_net_gen.enumeration
+import dsgrn_net_gen.stopping
+import dsgrn_net_gen.candidates
+import dsgrn_net_gen.sampling
+import dsgrn_net_gen.sharding
+import dsgrn_net_gen.supervisor
+import dsgrn_net_gen.dedup
+import dsgrn_net_gen.server
+import dsgrn_net_gen.walk
 
-__all__ = ["fileparsers","makejobs","networksearch","filters"]
+__all__ = ["fileparsers","makejobs","networksearch","filters","parallel","paramcache","paramcount","fingerprint","workgraph","filterchain","results","checkpoint","scheduler","instrumentation","enumeration","stopping","candidates","sampling","sharding","supervisor","dedup","server","walk"]
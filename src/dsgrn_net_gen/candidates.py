@@ -0,0 +1,65 @@
+import random
+from collections import OrderedDict
+
+#####################################################################################################################
+# Indexes of the allowed nodes and edges for drawing random perturbations.
+#####################################################################################################################
+
+# random draws that may fail before the valid candidates are listed explicitly
+RETRIES = 32
+
+
+class EdgeIndex():
+    '''
+    The edges of an edge list indexed by source and target label, made once per search. The edges between the nodes
+    of a graph are listed once for each set of node labels and remembered, so that drawing an edge that can be added
+    to a perturbed graph does not go through the whole edge list. All lists are sorted, so that draws only depend on
+    the pseudo-random state.
+    '''
+
+    def __init__(self, edgelist, maxpools=1024):
+        self.edges = sorted(set(tuple(e) for e in edgelist))
+        self.by_source = {}
+        self.by_target = {}
+        for e in self.edges:
+            self.by_source.setdefault(e[0], []).append(e)
+            self.by_target.setdefault(e[1], []).append(e)
+        self.pools = OrderedDict()
+        self.maxpools = maxpools
+
+    def pool(self, labels):
+        # edges of the edge list whose source and target are both in labels
+        key = frozenset(labels)
+        if key in self.pools:
+            self.pools.move_to_end(key)
+            return self.pools[key]
+        edges = [e for s in sorted(key) for e in self.by_source.get(s, ()) if e[1] in key]
+        self.pools[key] = edges
+        if len(self.pools) > self.maxpools:
+            self.pools.popitem(last=False)
+        return edges
+
+    def inedges(self, label):
+        return self.by_target.get(label, [])
+
+    def outedges(self, label):
+        return self.by_source.get(label, [])
+
+
+def draw(candidates, valid):
+    '''
+    Uniformly random element of a list for which valid(element) is True. Random elements are tried first, which
+    costs O(1) per draw when most elements are valid; after RETRIES invalid elements the valid ones are listed.
+
+    :param candidates: sorted list
+    :param valid: function of an element of candidates
+    :return: an element of candidates, or None if no element is valid
+    '''
+    if not candidates:
+        return None
+    for _ in range(RETRIES):
+        c = candidates[random.randrange(len(candidates))]
+        if valid(c):
+            return c
+    candidates = [c for c in candidates if valid(c)]
+    return random.choice(candidates) if candidates else None
@@ -0,0 +1,57 @@
+import json, os, random, time
+
+#####################################################################################################################
+# Checkpoints of a network search.
+#####################################################################################################################
+
+def save(fname, state):
+    '''
+    Write the state of a search to a JSON file. The file is replaced atomically, so that a job that is killed while
+    saving keeps the previous checkpoint.
+
+    :param fname: path to the checkpoint file
+    :param state: dictionary of JSON-serializable search state
+    :return: None
+    '''
+    tmpname = fname + ".tmp"
+    with open(tmpname, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpname, fname)
+
+
+def due(params, last_save):
+    # whether to save the state now; "checkpoint_interval" is a number of seconds, "always" to save after every step
+    # of the search, or 0 or None for no checkpoints
+    interval = params["checkpoint_interval"]
+    if not interval:
+        return False
+    return interval == "always" or time.time() - last_save >= interval
+
+
+def load(fname):
+    # returns the saved state, or None if there is no checkpoint
+    if not os.path.exists(fname):
+        return None
+    with open(fname) as f:
+        return json.load(f)
+
+
+def get_random_state():
+    # JSON-serializable state of the random module
+    return random_state_to_json(random.getstate())
+
+
+def random_state_to_json(state):
+    version, internal, gauss = state
+    return [version, list(internal), gauss]
+
+
+def set_random_state(state):
+    random.setstate(json_to_random_state(state))
+
+
+def json_to_random_state(state):
+    version, internal, gauss = state
+    return version, tuple(internal), gauss
@@ -0,0 +1,169 @@
+import json, os, tempfile
+from array import array
+import dsgrn_net_gen.fingerprint as fingerprint
+
+#####################################################################################################################
+# Sets of accepted networks whose memory does not grow with the length of the network specifications.
+#####################################################################################################################
+
+MASK64 = 2**64 - 1
+# the table doubles when it is this full
+MAXLOAD = 0.6
+
+
+class FingerprintSet():
+    '''
+    Set of nonnegative 128-bit integers, such as the fingerprints made by fingerprint.digest, in an open-addressing hash
+    table backed by an array of 64-bit words. Each member takes 16 bytes of the table, which with the free slots is
+    about half the memory of a Python integer in a set. The keys 0 and 1 are not told apart.
+    '''
+
+    def __init__(self, capacity=1024):
+        self.capacity = 1
+        while self.capacity * MAXLOAD < capacity:
+            self.capacity *= 2
+        self.table = array("Q", bytes(16 * self.capacity))
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self._find(*split(key))[1]
+
+    def add(self, key):
+        # returns True if key was not in the set
+        hi, lo = split(key)
+        slot, found = self._find(hi, lo)
+        if found:
+            return False
+        self.table[2*slot] = hi
+        self.table[2*slot + 1] = lo
+        self.size += 1
+        if self.size > self.capacity * MAXLOAD:
+            self._grow()
+        return True
+
+    def _find(self, hi, lo):
+        # linear probing from the low word; (0, 0) marks an empty slot
+        table = self.table
+        mask = self.capacity - 1
+        slot = lo & mask
+        while True:
+            h, l = table[2*slot], table[2*slot + 1]
+            if h == hi and l == lo:
+                return slot, True
+            if h == 0 and l == 0:
+                return slot, False
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        old = self.table
+        self.capacity *= 2
+        self.table = array("Q", bytes(16 * self.capacity))
+        for k in range(0, len(old), 2):
+            if old[k] or old[k + 1]:
+                slot = self._find(old[k], old[k + 1])[0]
+                self.table[2*slot] = old[k]
+                self.table[2*slot + 1] = old[k + 1]
+
+
+def split(key):
+    # high and low 64-bit words of a key; 0 is stored as 1, since (0, 0) marks an empty slot
+    hi, lo = key >> 64 & MASK64, key & MASK64
+    if not hi and not lo:
+        lo = 1
+    return hi, lo
+
+
+class NetworkSet():
+    '''
+    Set of network specifications that keeps only their 128-bit fingerprints in memory and appends the specifications
+    themselves to a temporary file in spilldir, which is deleted when the set is closed or garbage collected. Supports
+    the operations of a set of strings used by the search: in, add, update, len and iteration, which reads the
+    specifications back from the file in the order they were added. If keep is True, the file is only deleted by
+    close(), so that a set saved in a checkpoint with to_json can be restored with from_json after the process dies.
+    '''
+
+    def __init__(self, spilldir=None, keep=False):
+        self.fingerprints = FingerprintSet()
+        self.file = tempfile.NamedTemporaryFile("w", dir=spilldir, prefix="networks", suffix=".jsonl", delete=not keep)
+        self.keep = keep
+
+    @classmethod
+    def restore(cls, saved):
+        # the set saved by to_json; the file is cut back to the saved length and appended to
+        self = cls.__new__(cls)
+        self.fingerprints = FingerprintSet()
+        if not os.path.exists(saved["spill_file"]):
+            raise ValueError("\nThe spilled networks {} of the checkpoint are missing.\n".format(saved["spill_file"]))
+        with open(saved["spill_file"], "r+") as f:
+            f.truncate(saved["offset"])
+        self.file = open(saved["spill_file"], "a")
+        self.keep = True
+        for netspec in self:
+            self.fingerprints.add(fingerprint.digest(netspec))
+        return self
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, netspec):
+        return fingerprint.digest(netspec) in self.fingerprints
+
+    def add(self, netspec):
+        if self.fingerprints.add(fingerprint.digest(netspec)):
+            self.file.write(json.dumps(netspec) + "\n")
+
+    def update(self, netspecs):
+        for netspec in netspecs:
+            self.add(netspec)
+
+    def __iter__(self):
+        self.file.flush()
+        # a separate file object, so that reading does not move the position of the writes
+        with open(self.file.name) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def close(self):
+        self.file.close()
+        if self.keep and os.path.exists(self.file.name):
+            os.remove(self.file.name)
+
+
+def make_network_set(params, keep=False):
+    # the set of accepted networks of a search, spilled to disk if params["spill_networks"] is set
+    if params["spill_networks"]:
+        return NetworkSet(params["spill_dir"], keep)
+    return set()
+
+
+def to_json(networks):
+    # networks for a checkpoint: the file and length of a NetworkSet, so that the specifications are not read back
+    if isinstance(networks, NetworkSet):
+        networks.file.flush()
+        return {"spill_file" : os.path.abspath(networks.file.name), "offset" : networks.file.tell()}
+    return sorted(networks)
+
+
+def from_json(params, saved, keep=False):
+    # networks saved by to_json
+    if isinstance(saved, dict):
+        return NetworkSet.restore(saved)
+    networks = make_network_set(params, keep)
+    networks.update(saved)
+    return networks
+
+
+def search_result(networks):
+    # the networks returned by a search: a list, or the NetworkSet itself, so that they are not all read into memory
+    if isinstance(networks, NetworkSet):
+        return networks
+    return list(networks)
+
+
+def close(networks):
+    # delete the file of a NetworkSet
+    if isinstance(networks, NetworkSet):
+        networks.close()
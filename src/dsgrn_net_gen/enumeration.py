@@ -0,0 +1,153 @@
+import time
+# networksearch imports this module; a from-import also works while networksearch is partly initialized
+from dsgrn_net_gen import networksearch
+import dsgrn_net_gen.fingerprint as fingerprint
+import dsgrn_net_gen.filters as filters
+import dsgrn_net_gen.paramcount as paramcount
+
+#####################################################################################################################
+# Exhaustive search of the graphs within a few operations of the seed network.
+#####################################################################################################################
+
+OPERATIONS = ["addNode", "addEdge", "removeEdge", "removeNode"]
+
+
+def enumerate_networks(starting_graph, params, networks, start_time):
+    '''
+    Check every graph that can be reached from the starting graph in at most the largest number of operations in
+    params["range_operations"], visiting the graphs breadth-first in order of the number of operations. Only the
+    operations with nonzero probability are used, nodes and edges are taken from params["nodelist"] and
+    params["edgelist"] when they are given, and negative self-loops are never added. A graph reached in fewer
+    operations than the smallest number in range_operations is also checked, since the random search reaches it
+    too by undoing operations. Each distinct labelled graph is checked exactly once. If nodes and edges are only
+    added, degrees and parameter counts only grow, so a graph with too many in- or out-edges at a node (see
+    "dsgrn_limits" and the constrained_inedges and constrained_outedges filters) or too many parameters is rejected
+    without the other checks and the graphs beyond it are not generated. The search stops early when
+    params["numneighbors"] networks are accepted or params["time_to_wait"] seconds have passed.
+
+    :param starting_graph: WorkGraph of the seed network
+    :param params: parameters initialized by networksearch.setup
+    :param networks: set of accepted network specifications, updated in place
+    :param start_time: time.time() at the start of the search
+    :return: the number of graphs that were checked
+    '''
+    maxops = params["range_operations"][1] - 1
+    allowed = allowed_operations(params["probabilities"])
+    bounds = growth_bounds(params) if not (allowed["removeEdge"] or allowed["removeNode"]) else None
+    seen = set([fingerprint.fingerprint(starting_graph)])
+    frontier = [starting_graph]
+    count = 0
+    for _ in range(maxops):
+        nextfrontier = []
+        for graph in frontier:
+            for neighbor in neighbors(graph, params, allowed):
+                key = fingerprint.fingerprint(neighbor)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if len(networks) >= params['numneighbors'] or time.time() - start_time >= params['time_to_wait']:
+                    return count
+                count += 1
+                msg = bounds and exceeds_bounds(neighbor, bounds, params)
+                if msg:
+                    # neither this graph nor anything made from it by adding nodes and edges is accepted
+                    networksearch.warn(msg, neighbor, None, params)
+                    continue
+                netspec, msg = networksearch.evaluate(neighbor, params)
+                if msg:
+                    networksearch.warn(msg, neighbor, netspec, params)
+                else:
+                    info = networksearch.network_info(neighbor, netspec, params, None)
+                    networksearch.add_network(networks, netspec, params, info)
+                nextfrontier.append(neighbor)
+                if not count % 1000 and params["compressed_output"]:
+                    networksearch.update_line(params["msg_dict"], len(networks))
+        frontier = nextfrontier
+    return count
+
+
+def allowed_operations(probabilities):
+    # probabilities is the cumulative vector made by networksearch.make_probability_vector
+    previous = [0.0] + probabilities[:-1]
+    return {op : p > q for op, p, q in zip(OPERATIONS, probabilities, previous)}
+
+
+def neighbors(graph, params, allowed):
+    # graphs one operation away, in a fixed order
+    labels = set(graph.vertex_label(v) for v in graph.vertices())
+    if allowed["addNode"]:
+        if params["nodelist"]:
+            for label in sorted(set(params["nodelist"]).difference(labels)):
+                neighbor = graph.clone()
+                neighbor.add_vertex(len(labels), label=label)
+                yield neighbor
+        else:
+            # new nodes without a node list are interchangeable, so one name is enough
+            yield networksearch.addNodes(graph.clone(), [], 1)
+    if allowed["addEdge"]:
+        for (u, v, reg) in missing_edges(graph, params["edge_index"], labels):
+            neighbor = graph.clone()
+            neighbor.add_edge(u, v, reg)
+            yield neighbor
+    if allowed["removeEdge"]:
+        edges = graph.edges()
+        # as in networksearch.removeEdges, at least one edge is left
+        if len(edges) > 1:
+            for (u, v) in edges:
+                neighbor = graph.clone()
+                neighbor.remove_edge(u, v)
+                yield neighbor
+    if allowed["removeNode"]:
+        # as in networksearch.removeNodes, at least one node is left
+        if len(labels) > 1:
+            for v in graph.vertices():
+                neighbor = graph.clone()
+                neighbor.remove_vertex(v)
+                yield neighbor
+
+
+def missing_edges(graph, edgeindex, labels):
+    # edges between nodes of the graph that can be added, without negative self-loops or a second edge between the
+    # same pair of nodes
+    if edgeindex:
+        candidates = sorted((graph.get_vertex_from_label(s), graph.get_vertex_from_label(t), reg)
+                            for (s, t, reg) in edgeindex.pool(labels))
+    else:
+        candidates = [(u, v, reg) for u in graph.vertices() for v in graph.vertices() for reg in "ar"]
+    return [(u, v, reg) for (u, v, reg) in candidates
+            if not (u == v and reg == "r") and not graph.has_edge(u, v)]
+
+
+def growth_bounds(params):
+    # limits that stay violated when nodes and edges are added
+    bounds = {"max_inedges" : [], "max_outedges" : []}
+    limits = params["dsgrn_limits"]
+    for key in bounds:
+        if limits[key] is not None:
+            bounds[key].append((limits[key], "Not computable"))
+    for fil in params["filters"]:
+        kwargs = fil.keywords.get("kwargs", {})
+        if fil.func is filters.constrained_inedges and "max_inedges" in kwargs:
+            bounds["max_inedges"].append((kwargs["max_inedges"], "In-edges not in range"))
+        if fil.func is filters.constrained_outedges and "max_outedges" in kwargs:
+            bounds["max_outedges"].append((kwargs["max_outedges"], "Out-edges not in range"))
+    return bounds
+
+
+def exceeds_bounds(graph, bounds, params):
+    # returns the warning message of the first violated bound, or ""
+    vertices = graph.vertices()
+    if vertices:
+        maxin = max(graph.indegree(v) for v in vertices)
+        maxout = max(graph.outdegree(v) for v in vertices)
+        for limit, msg in bounds["max_inedges"]:
+            if maxin > limit:
+                return msg
+        for limit, msg in bounds["max_outedges"]:
+            if maxout > limit:
+                return msg
+    if params["estimate_params"]:
+        computable, size = paramcount.estimate(graph)
+        if computable and size > params['maxparams']:
+            return "Too many params"
+    return ""
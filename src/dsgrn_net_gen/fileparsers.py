@@ -1,45 +1,121 @@
+import ast, hashlib, json, os, pickle
 
-def parseEdgeFile(fname):
+# bump when the parsed form of a file changes, so that older cache files are parsed again
+CACHE_VERSION = 1
+
+
+def parseEdgeFile(fname, cachedir=None):
     ''' Returns a list of (source, target, regulation) edges.
     File format must be:
     1) optional comment lines/column headers beginning with #
     2) data lines where the first column is an edge of the form TARGET_GENE = TYPE_REG(SOURCE_GENE)
     3) other columns in the line must be space, tab, or comma separated
-    
+
+    If cachedir is given, the parsed edges are saved there and reused while the file keeps its path, size and
+    modification time.
     '''
-    edgelist=[]
-    with open(fname,'r') as f:
-        for l in f.readlines():
-            if l.strip():
-                if l[0] == '#':
-                    continue
-                wordlist=l.replace(',',' ').replace('=',' ').split()
-                target=wordlist[0]
-                regsource=wordlist[1].replace('(',' ').replace(')',' ').split()
-                if "a" in regsource[0] and "r" not in regsource[0]:
-                    reg="a"
-                elif "r" in regsource[0] and "a" not in regsource[0]:
-                    reg = "r"
-                else:
-                    raise ValueError("Regulation type ill-specified in edge list.")
-                source=regsource[1]
-                edgelist.append((source,target,reg))
-    return edgelist
-
-def parseNodeFile(fname):
+    return _cached(fname, cachedir, "edge", lambda: list(iterEdgeFile(fname)))
+
+
+def parseNodeFile(fname, cachedir=None):
     ''' Returns a list of nodes from the file.
-    File format must be: 
-    1) optional comment lines/column headers beginning with # 
+    File format must be:
+    1) optional comment lines/column headers beginning with #
     2) data lines beginning with NODE_NAME
     3) other columns in the line must be space, tab, or comma separated
-    
+
+    If cachedir is given, the parsed nodes are saved there and reused while the file keeps its path, size and
+    modification time.
+    '''
+    return _cached(fname, cachedir, "node", lambda: list(iterNodeFile(fname)))
+
+
+def iterEdgeFile(fname):
+    ''' Yields the (source, target, regulation) edges of an edge file one line at a time, see parseEdgeFile.
+    Repeated node names are the same string object, so that lists of edges of large files stay small.
     '''
-    nodelist = []
+    names = {}
     with open(fname,'r') as f:
-        for l in f.readlines():
-            if l.strip():
-                if l[0] == '#':
-                    continue
-                wordlist=l.replace(',',' ').split()
-                nodelist.append(wordlist[0])
-    return nodelist
+        for l in f:
+            if l[:1] == '#' or not l.strip():
+                continue
+            wordlist = l.replace(',',' ').replace('=',' ').split()
+            target = names.setdefault(wordlist[0], wordlist[0])
+            regsource = wordlist[1].replace('(',' ').replace(')',' ').split()
+            if "a" in regsource[0] and "r" not in regsource[0]:
+                reg = "a"
+            elif "r" in regsource[0] and "a" not in regsource[0]:
+                reg = "r"
+            else:
+                raise ValueError("Regulation type ill-specified in edge list.")
+            source = names.setdefault(regsource[1], regsource[1])
+            yield (source,target,reg)
+
+
+def iterNodeFile(fname):
+    ''' Yields the nodes of a node file one line at a time, see parseNodeFile.
+    '''
+    with open(fname,'r') as f:
+        for l in f:
+            if l[:1] == '#' or not l.strip():
+                continue
+            yield l.replace(',',' ').split()[0]
+
+
+def iterNetworkFile(fname):
+    ''' Yields the seed network specifications of a network file. The file holds either
+    1) a single network specification,
+    2) a list of network specifications in square brackets, or
+    3) one JSON record per line, either a network specification string or a dictionary with the key "network",
+       such as the networks.jsonl file of an earlier search.
+    Records of format 3 are read one line at a time, so that the first seed is available before the rest of the file
+    is read. A file that is empty or holds an empty list yields the empty network specification "".
+    '''
+    with open(fname,'r') as f:
+        start = f.read(1)
+        while start.isspace():
+            start = f.read(1)
+        if start in ('"','{'):
+            yield _networkRecord(start + f.readline())
+            for l in f:
+                if l.strip():
+                    yield _networkRecord(l)
+            return
+        text = start + f.read()
+    if start == "[":
+        networks = ast.literal_eval(text)
+        yield from networks if networks else [""]
+    else:
+        yield text.rstrip("\n")
+
+
+def _networkRecord(line):
+    record = json.loads(line)
+    return record["network"] if isinstance(record, dict) else record
+
+
+def _cached(fname, cachedir, kind, parse):
+    # parse the file, or load its parsed form from cachedir if the file has not changed since it was saved
+    if not cachedir:
+        return parse()
+    path = os.path.abspath(os.path.expanduser(fname))
+    st = os.stat(path)
+    key = [CACHE_VERSION, kind, path, st.st_size, st.st_mtime_ns]
+    cachedir = os.path.expanduser(cachedir)
+    cachefile = os.path.join(cachedir, kind + "_" + hashlib.sha1(path.encode()).hexdigest() + ".pickle")
+    try:
+        with open(cachefile, "rb") as f:
+            saved_key, parsed = pickle.load(f)
+        if saved_key == key:
+            return parsed
+    except Exception:
+        # missing, stale or unreadable cache file
+        pass
+    parsed = parse()
+    os.makedirs(cachedir, exist_ok=True)
+    # written under a temporary name and renamed, so that concurrent jobs never read a partial file
+    tmpname = "{}.{}.tmp".format(cachefile, os.getpid())
+    with open(tmpname, "wb") as f:
+        pickle.dump((key, parsed), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpname, cachefile)
+    return parsed
@@ -0,0 +1,105 @@
+import time
+import dsgrn_utilities.graphtranslation as graphtranslation
+import dsgrn_net_gen.workgraph as workgraph
+
+#####################################################################################################################
+# Ordered stages that check a perturbed graph, with per-stage cost and rejection statistics.
+#####################################################################################################################
+
+class Candidate():
+    '''
+    A perturbed graph together with its graphtranslation.Graph and network spec, which are only made if a stage
+    asks for them. The time to make the network spec is recorded in timers, if given.
+    '''
+    __slots__ = ("graph", "translated", "spec", "timers")
+
+    def __init__(self, graph, timers=None):
+        self.graph = graph
+        self.translated = None
+        self.spec = None
+        self.timers = timers
+
+    def gtgraph(self):
+        if self.translated is None:
+            self.translated = workgraph.to_graph(self.graph)
+        return self.translated
+
+    def netspec(self):
+        if self.spec is None:
+            graph = self.gtgraph()
+            start = time.perf_counter()
+            self.spec = graphtranslation.createEssentialNetworkSpecFromGraph(graph)
+            if self.timers is not None:
+                self.timers.add("createEssentialNetworkSpecFromGraph", start)
+        return self.spec
+
+
+class Stage():
+    __slots__ = ("name", "check", "time", "calls", "rejects")
+
+    def __init__(self, name, check):
+        self.name = name
+        self.check = check   # check(candidate, params) returns "" or a warning message
+        self.time = 0.0
+        self.calls = 0
+        self.rejects = 0
+
+    def expected_cost(self):
+        # time per call divided by the rejection rate, smoothed so that a stage that has not run yet comes first
+        # and a stage that never rejects moves to the end
+        return (self.time / max(self.calls, 1)) / ((self.rejects + 1) / (self.calls + 2))
+
+
+class FilterChain():
+    '''
+    Runs the stages on a candidate until one of them rejects it, recording the cumulative time, number of calls and
+    number of rejections of each stage. If adaptive is True, every reorder_every candidates the stages are sorted by
+    the expected cost per rejection (time per call divided by the rejection rate), which minimizes the expected cost
+    per candidate for independent stages. A rejected candidate is counted once under the message of the stage that
+    rejected it, so the total number of warnings does not depend on the order, but the number of each message does
+    when a candidate would fail more than one stage.
+    '''
+
+    def __init__(self, stages, adaptive=False, reorder_every=1000):
+        self.stages = list(stages)
+        self.adaptive = adaptive
+        self.reorder_every = reorder_every
+        self.count = 0
+
+    def __call__(self, graph, params):
+        # returns (netspec, "") if the graph passes every stage, otherwise (netspec or None, warning message)
+        candidate = Candidate(graph, params.get("timers"))
+        msg = ""
+        for stage in self.stages:
+            start = time.perf_counter()
+            msg = stage.check(candidate, params)
+            stage.time += time.perf_counter() - start
+            stage.calls += 1
+            if msg:
+                stage.rejects += 1
+                break
+        self.count += 1
+        if self.adaptive and not self.count % self.reorder_every:
+            self.reorder()
+        if msg:
+            return candidate.spec, msg
+        return candidate.netspec(), ""
+
+    def reorder(self):
+        self.stages.sort(key=lambda stage: stage.expected_cost())
+
+    def order(self):
+        return [stage.name for stage in self.stages]
+
+    def statistics(self):
+        return {stage.name : {"time" : stage.time, "calls" : stage.calls, "rejects" : stage.rejects}
+                for stage in self.stages}
+
+    def merge(self, statistics):
+        # add statistics() of another chain with the same stages, for example from a worker process
+        for stage in self.stages:
+            if stage.name in statistics:
+                stat = statistics[stage.name]
+                stage.time += stat["time"]
+                stage.calls += stat["calls"]
+                stage.rejects += stat["rejects"]
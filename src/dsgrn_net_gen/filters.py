@@ -1,4 +1,8 @@
-import networkx as nx
+# filters that only use vertices(), edges() and adjacencies(), so that they also run on a workgraph.WorkGraph;
+# any other function added to this module is given a graphtranslation.Graph
+WORKGRAPH_FILTERS = ["constrained_inedges", "constrained_outedges", "is_feed_forward", "is_strongly_connected",
+                     "is_connected"]
+
 
 def constrained_inedges(graph,kwargs={}):
     '''
@@ -7,8 +11,10 @@ def constrained_inedges(graph,kwargs={}):
     :param kwargs: A dictionary with the keys "min_inedges" and/or "max_inedges"
     :return: (True, "") or (False, error message), True if no node has a number of inedges that fall outside the bounds (endpoint inclusive)
     '''
-    for u in graph.vertices():
-        N = len([v for v in graph.vertices() if u in graph.adjacencies(v)])
+    indegree = dict.fromkeys(graph.vertices(),0)
+    for (u,v) in graph.edges():
+        indegree[v] += 1
+    for N in indegree.values():
         if ("min_inedges" in kwargs and N < kwargs["min_inedges"]) or ("max_inedges" in kwargs and N > kwargs["max_inedges"]):
             return False, "In-edges not in range"
     return True, ""
@@ -35,12 +41,8 @@ def is_feed_forward(graph,kwargs={}):
     :param kwargs: empty dictionary, here for API compliance
     :return: (True, "") or (False, error message), True if satisfied
     '''
-    G = nx.DiGraph()
-    G.add_edges_from(graph.edges())
-    G.add_nodes_from(graph.vertices())
-    scc = nx.strongly_connected_components(G)
     # throw out graphs with non-trivial cycles
-    if any(len(s) > 1 for s in scc):
+    if any(len(s) > 1 for s in _strongly_connected_components(graph)):
         return False, "Not feed-forward"
     return True, ""
 
@@ -52,10 +54,8 @@ def is_strongly_connected(graph,kwargs={}):
     :param kwargs: empty dictionary, here for API compliance
     :return: (True, "") or (False, error message), True if satisfied
     '''
-    G = nx.DiGraph()
-    G.add_edges_from(graph.edges())
-    G.add_nodes_from(graph.vertices())
-    if G and nx.is_strongly_connected(G):
+    vertices = list(graph.vertices())
+    if vertices and len(_strongly_connected_components(graph)) == 1:
         return True, ""
     else:
         return False, "Not strongly connected"
@@ -69,10 +69,85 @@ def is_connected(graph,kwargs={}):
     :param kwargs: empty dictionary, here for API compliance
     :return: (True, "") or (False, error message), True if satisfied
     '''
-    G = nx.DiGraph()
-    G.add_edges_from(graph.edges())
-    G.add_nodes_from(graph.vertices())
-    if G and nx.is_weakly_connected(G):
+    vertices = list(graph.vertices())
+    if vertices and _number_of_weak_components(graph) == 1:
         return True, ""
     else:
         return False, "Not connected"
+
+
+###############################################################################################
+# Graph algorithms on the adjacency lists of the graph object
+###############################################################################################
+
+def _strongly_connected_components(graph):
+    '''
+    Iterative version of Tarjan's algorithm.
+    :param graph: A dsgrn_net_gen.graphtranslation object
+    :return: list of lists of vertices, one list per strongly connected component
+    '''
+    index = {}
+    lowlink = {}
+    onstack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in graph.vertices():
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        onstack.add(root)
+        work = [(root, iter(graph.adjacencies(root)))]
+        while work:
+            v, children = work[-1]
+            for w in children:
+                if w not in index:
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    onstack.add(w)
+                    work.append((w, iter(graph.adjacencies(w))))
+                    break
+                elif w in onstack:
+                    lowlink[v] = min(lowlink[v], index[w])
+            else:
+                # all children of v are done
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    lowlink[u] = min(lowlink[u], lowlink[v])
+                if lowlink[v] == index[v]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        onstack.discard(w)
+                        component.append(w)
+                        if w == v:
+                            break
+                    components.append(component)
+    return components
+
+
+def _number_of_weak_components(graph):
+    '''
+    Union-find over the edges, ignoring edge direction.
+    :param graph: A dsgrn_net_gen.graphtranslation object
+    :return: number of weakly connected components
+    '''
+    parent = {v : v for v in graph.vertices()}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    components = len(parent)
+    for (u,v) in graph.edges():
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[ru] = rv
+            components -= 1
+    return components
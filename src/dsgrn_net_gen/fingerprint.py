@@ -0,0 +1,135 @@
+import hashlib
+
+#####################################################################################################################
+# Fingerprints of labelled graphs and canonical forms for isomorphism checking.
+#####################################################################################################################
+
+# Give up on an exact canonical form after this many leaves of the search tree; with the pruning by automorphisms
+# only unusual graphs get there, and they are not identified with any graph with other node labels.
+MAXLEAVES = 5040
+
+
+def fingerprint(graph):
+    '''
+    128-bit fingerprint of a labelled graph. Two graphs have the same fingerprint exactly when they have the same
+    node labels and the same labelled, signed edges, regardless of the vertex numbering.
+
+    :param graph: A dsgrn_utilities.graphtranslation object
+    :return: integer
+    '''
+    labels = sorted(graph.vertex_label(v) for v in graph.vertices())
+    edges = sorted("{}>{}{}".format(graph.vertex_label(u), graph.vertex_label(v), graph.edge_label(u, v))
+                   for (u, v) in graph.edges())
+    return digest("\n".join(labels) + "|" + "\n".join(edges))
+
+
+def canonical_fingerprint(graph):
+    '''
+    128-bit fingerprint of the canonical form of a graph, ignoring node labels but not edge signs. Isomorphic graphs
+    have the same canonical fingerprint.
+
+    :param graph: A dsgrn_utilities.graphtranslation object
+    :return: integer
+    '''
+    return digest(str(canonical_form(graph)))
+
+
+def digest(s):
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=16).digest(), "big")
+
+
+def canonical_form(graph):
+    '''
+    Canonical form of the graph by individualization-refinement: vertices are colored by Weisfeiler-Lehman refinement
+    on signed in- and out-edges, ties are broken by individualizing each vertex of the first non-singleton color class
+    in turn, and the smallest resulting edge list is the canonical form. Two leaves of the search tree with the same
+    edge list give an automorphism of the graph, and a vertex is not individualized if an automorphism that fixes
+    the vertices individualized above it maps it to a vertex that was. If the search is still cut off after MAXLEAVES
+    leaves, the form depends on the node labels, so that the graph is only identified with graphs with the same labels.
+
+    :param graph: A dsgrn_utilities.graphtranslation object
+    :return: (number of vertices, tuple of (source rank, target rank, regulation) edges)
+    '''
+    vertices = sorted(graph.vertices())
+    index = {v: k for k, v in enumerate(vertices)}
+    inedges = [[] for _ in vertices]
+    outedges = [[] for _ in vertices]
+    for (u, v) in graph.edges():
+        label = graph.edge_label(u, v)
+        outedges[index[u]].append((label, index[v]))
+        inedges[index[v]].append((label, index[u]))
+    tree = {"first" : None, "best" : None, "leaves" : 0, "automorphisms" : [], "truncated" : False}
+    search(refine([0]*len(vertices), inedges, outedges), inedges, outedges, tree, [])
+    if tree["truncated"]:
+        # not canonical: isomorphic graphs with different labels get different forms, so none of them are collapsed
+        return ("labelled", fingerprint(graph))
+    return tree["best"][0]
+
+
+def refine(colors, inedges, outedges):
+    # Weisfeiler-Lehman refinement to a stable coloring; colors are ranks of signatures, so they do not depend on
+    # the vertex numbering
+    numcolors = len(set(colors))
+    while True:
+        signatures = [(colors[v], tuple(sorted((l, colors[u]) for (l, u) in inedges[v])),
+                       tuple(sorted((l, colors[w]) for (l, w) in outedges[v]))) for v in range(len(colors))]
+        ranks = {s: k for k, s in enumerate(sorted(set(signatures)))}
+        colors = [ranks[s] for s in signatures]
+        if len(ranks) == numcolors:
+            return colors
+        numcolors = len(ranks)
+
+
+def search(colors, inedges, outedges, tree, fixed):
+    # tree holds the first and the best leaf as (form, colors), the number of leaves, the automorphisms found and
+    # whether the search was cut off; fixed is the list of individualized vertices on the path to this node
+    if tree["leaves"] >= MAXLEAVES:
+        tree["truncated"] = True
+        return
+    cells = {}
+    for v, c in enumerate(colors):
+        cells.setdefault(c, []).append(v)
+    ties = [cells[c] for c in sorted(cells) if len(cells[c]) > 1]
+    if not ties:
+        add_leaf(colors, outedges, tree)
+        return
+    done = []
+    for v in ties[0]:
+        if done and any(u in done for u in orbit(v, tree["automorphisms"], fixed)):
+            continue
+        done.append(v)
+        # individualize v by splitting it off below the rest of its color class
+        individualized = [2*c + (u != v) for u, c in enumerate(colors)]
+        search(refine(individualized, inedges, outedges), inedges, outedges, tree, fixed + [v])
+
+
+def add_leaf(colors, outedges, tree):
+    # colors are a numbering of the vertices at a leaf; record an automorphism if the edge list repeats
+    tree["leaves"] += 1
+    form = (len(colors), tuple(sorted((colors[u], colors[w], l) for u in range(len(colors)) for (l, w) in outedges[u])))
+    leaf = (form, colors)
+    if tree["first"] is None:
+        tree["first"] = tree["best"] = leaf
+        return
+    for other in [tree["first"], tree["best"]]:
+        if form == other[0]:
+            # map each vertex to the vertex with the same number at the other leaf
+            vertex = {c: u for u, c in enumerate(other[1])}
+            tree["automorphisms"].append([vertex[c] for c in colors])
+            return
+    if form < tree["best"][0]:
+        tree["best"] = leaf
+
+
+def orbit(v, automorphisms, fixed):
+    # orbit of v under the group generated by the automorphisms that fix every vertex in fixed
+    generators = [g for g in automorphisms if all(g[u] == u for u in fixed)]
+    seen = {v}
+    stack = [v]
+    while stack:
+        u = stack.pop()
+        for g in generators:
+            if g[u] not in seen:
+                seen.add(g[u])
+                stack.append(g[u])
+    return seen
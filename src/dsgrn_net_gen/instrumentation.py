@@ -0,0 +1,70 @@
+import time
+
+#####################################################################################################################
+# Timers and counters of the steps of a network search.
+#####################################################################################################################
+
+class Timers():
+    '''
+    Cumulative wall time and number of calls of named steps of the search. A step is recorded with
+
+        start = time.perf_counter()
+        ...
+        timers.add(name, start)
+
+    which costs two clock reads and two dictionary updates, so the timers are always on.
+    '''
+    __slots__ = ("time", "calls")
+
+    def __init__(self):
+        self.time = {}
+        self.calls = {}
+
+    def add(self, name, start):
+        self.time[name] = self.time.get(name, 0.0) + time.perf_counter() - start
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def statistics(self):
+        return {name : {"time" : self.time[name], "calls" : self.calls[name]} for name in self.time}
+
+    def merge(self, statistics):
+        # add statistics() of another Timers object, for example from a worker process
+        for name, stat in statistics.items():
+            self.time[name] = self.time.get(name, 0.0) + stat["time"]
+            self.calls[name] = self.calls.get(name, 0) + stat["calls"]
+
+
+class Timeline():
+    '''
+    Samples of (elapsed seconds, perturbed networks, accepted networks) taken at least interval seconds apart, from
+    which the acceptance rate over the course of the search follows. When there are maxsamples samples, every other
+    sample is dropped and the interval is doubled, so a long search keeps a bounded number of evenly spaced samples.
+    '''
+    __slots__ = ("samples", "interval", "maxsamples", "last")
+
+    def __init__(self, interval=1.0, maxsamples=1000):
+        self.samples = []
+        self.interval = interval
+        self.maxsamples = maxsamples
+        self.last = None
+
+    def sample(self, elapsed, perturbed, accepted, force=False):
+        if not force and self.last is not None and elapsed - self.last < self.interval:
+            return
+        self.samples.append([elapsed, perturbed, accepted])
+        self.last = elapsed
+        if len(self.samples) >= self.maxsamples:
+            self.samples = self.samples[::2]
+            self.interval *= 2
+
+    def statistics(self):
+        return [list(s) for s in self.samples]
+
+
+def difference(after, before):
+    # statistics recorded between two snapshots of Timers.statistics() or FilterChain.statistics()
+    diff = {}
+    for name, stat in after.items():
+        old = before.get(name, {})
+        diff[name] = {key : value - old.get(key, 0) for key, value in stat.items()}
+    return diff
@@ -1,6 +1,10 @@
 import dsgrn_net_gen.networksearch as networksearch
+import dsgrn_net_gen.scheduler as scheduler
 import dsgrn_net_gen.fileparsers as fileparsers
-import subprocess, os, json, shutil, ast, sys, time
+import dsgrn_net_gen.results as results
+import dsgrn_net_gen.checkpoint as checkpoint
+import dsgrn_net_gen.dedup as dedup
+import os, json, shutil, sys, time, glob
 
 
 class Job():
@@ -8,62 +12,237 @@ class Job():
     def __init__(self,paramfile):
         self.paramfile = paramfile
         self.params = json.load(open(paramfile))
+        self.params["random_seed"] = time.time() if "random_seed" not in self.params else self.params["random_seed"]
+        resultsdir = "" if "resultsdir" not in self.params else self.params["resultsdir"]
         # use datetime as unique identifier to avoid overwriting
         if "datetime" not in self.params:
-            datetime = subprocess.check_output(['date +%Y_%m_%d_%H_%M_%S'],shell=True).decode(sys.stdout.encoding).strip()
+            datetime = self._claim_datetime(resultsdir)
             self.params["datetime"] = datetime
         else:
             datetime = self.params["datetime"]
-        self.params["random_seed"] = time.time() if "random_seed" not in self.params else self.params["random_seed"]
-        resultsdir = "" if "resultsdir" not in self.params else self.params["resultsdir"]
         resultsdir =os.path.join(os.path.expanduser(resultsdir), "dsgrn_net_gen_results"+datetime)
-        self.perturbationsdir = os.path.join(resultsdir,"networks"+datetime)
+        self._setdirs(resultsdir,datetime)
         os.makedirs(self.perturbationsdir)
-        self.inputfilesdir = os.path.join(resultsdir,"inputs"+datetime)
         os.makedirs(self.inputfilesdir)
+        self.resume_state = None
         # save parameter file to computations folder
+        # written in place, since shards of a job may start in the same working directory at once
         newpfile = os.path.basename(paramfile).split(".")[0]+"_copy.json"
-        json.dump(self.params,open(newpfile,"w"))
-        shutil.move(newpfile,self.inputfilesdir)
+        with open(os.path.join(self.inputfilesdir,newpfile),"w") as f:
+            json.dump(self.params,f)
         shutil.copy(self.params["networkfile"], self.inputfilesdir)
         #TODO: Record versions/git number of DSGRN and dsgrn_net_gen
 
+    @classmethod
+    def resume(cls,resultsdir):
+        '''
+        Make a Job that continues an interrupted search from the last checkpoint in its results directory.
+        The copies of the input files in the results directory are used.
+
+        :param resultsdir: path to a dsgrn_net_gen_results<datetime> directory
+        :return: Job object; call run() to finish the search
+        '''
+        resultsdir = os.path.normpath(os.path.expanduser(resultsdir))
+        datetime = os.path.basename(resultsdir)[len("dsgrn_net_gen_results"):]
+        job = cls.__new__(cls)
+        job._setdirs(resultsdir,datetime)
+        job.resume_state = checkpoint.load(job.checkpointfile)
+        if job.resume_state is None:
+            raise ValueError("No checkpoint found in {}.".format(resultsdir))
+        job.paramfile = glob.glob(os.path.join(job.inputfilesdir,"*_copy.json"))[0]
+        job.params = json.load(open(job.paramfile))
+        for f in ["networkfile","edgefile","nodefile"]:
+            if f in job.params and job.params[f].strip():
+                job.params[f] = os.path.join(job.inputfilesdir,os.path.basename(job.params[f]))
+        return job
+
+    def _claim_datetime(self,resultsdir):
+        # make the results directory of this job; jobs started in the same second, for example by the job server,
+        # get a suffix
+        stamp = time.strftime("%Y_%m_%d_%H_%M_%S")
+        datetime, k = stamp, 1
+        while True:
+            try:
+                os.makedirs(os.path.join(os.path.expanduser(resultsdir),"dsgrn_net_gen_results"+datetime))
+                return datetime
+            except FileExistsError:
+                datetime = "{}_{}".format(stamp,k)
+                k += 1
+
+    def _setdirs(self,resultsdir,datetime):
+        self.resultsdir = resultsdir
+        self.perturbationsdir = os.path.join(resultsdir,"networks"+datetime)
+        self.inputfilesdir = os.path.join(resultsdir,"inputs"+datetime)
+        self.checkpointfile = os.path.join(resultsdir,"checkpoint.json")
+
     def _parsefile(self,eorn,parsefunc):
         f = eorn+"file"
         l = eorn+"list"
         if f in self.params and self.params[f].strip():
+            cachedir = self.params["parse_cache"] if "parse_cache" in self.params else None
             try:
-                self.params[l] = parsefunc(self.params[f])
-                shutil.copy(self.params[f], self.inputfilesdir)
+                self.params[l] = parsefunc(self.params[f],cachedir)
+                if os.path.dirname(os.path.abspath(self.params[f])) != os.path.abspath(self.inputfilesdir):
+                    shutil.copy(self.params[f], self.inputfilesdir)
             except:
                 raise ValueError("Invalid " + eorn + " file.")
         else:
             self.params[l] = None
 
-    def run(self):
-        # read network file
-        networks = open(self.params["networkfile"]).read()
-        try: 
-            if networks[0] == "[":
-                networks = ast.literal_eval(networks)
-                if not networks:
-                    networks = [""]
+    def _stream_writer(self):
+        # append each new network to networks.jsonl as soon as it is accepted
+        if "stream_output" in self.params and not self.params["stream_output"]:
+            return None
+        interval = 10 if "sync_interval" not in self.params else self.params["sync_interval"]
+        return results.NetworkWriter(os.path.join(self.perturbationsdir,"networks.jsonl"),sync_interval=interval)
+
+    def _results_store(self):
+        # index the accepted networks and their metadata in networks.db if requested
+        if "results_db" not in self.params or not self.params["results_db"]:
+            return None
+        return results.ResultsStore(os.path.join(self.perturbationsdir,"networks.db"))
+
+    def _on_accept(self,writer,store):
+        # record each accepted network in networks.jsonl and networks.db
+        if not writer and not store:
+            return None
+
+        def on_accept(netspec,**info):
+            if writer:
+                writer(netspec)
+            if store:
+                store(netspec,**info)
+        return on_accept
+
+    def _checkpoint_interval(self):
+        return 300 if "checkpoint_interval" not in self.params else self.params["checkpoint_interval"]
+
+    def _checkpointer(self,seed_index,finished,writer=None,stats_file=None):
+        # save the search state of seed network seed_index along with the networks of the earlier seeds and the length
+        # of their statistics in stats.jsonl; the networks are referred to by the length of networks.jsonl, which holds
+        # them, or of their spill file, and are only written out in full if there is neither
+        if not self._checkpoint_interval():
+            return None
+
+        def save_state(state):
+            state["seed_index"] = seed_index
+            if writer and not isinstance(finished,dedup.NetworkSet):
+                # may include networks of this seed, which the resumed search finds again
+                state["networks_offset"] = writer.offset()
             else:
-                while networks[-1] == '\n':
-                    networks = networks[:-1]
-                networks = [networks]
-        except IndexError:
-            networks = [""]
+                state["finished"] = dedup.to_json(finished)
+            if stats_file:
+                os.fsync(stats_file.fileno())
+                state["stats_offset"] = stats_file.tell()
+            checkpoint.save(self.checkpointfile,state)
+            self.last_save = time.time()
+            # a checkpoint inside the search of a seed refers to its spilled networks until the next one is saved
+            self.saved_search = seed_index if "networks" in state else None
+        return save_state
+
+    def _accepted_networks(self,state):
+        # networks of all seeds, without duplicates; only their fingerprints are kept in memory if spill_networks is set
+        spill = "spill_networks" in self.params and self.params["spill_networks"]
+        if spill and ("spill_dir" not in self.params or not self.params["spill_dir"]):
+            self.params["spill_dir"] = self.perturbationsdir
+        if state and isinstance(state.get("finished"),dict):
+            # the spill file of the seeds finished before the checkpoint
+            return dedup.NetworkSet.restore(state["finished"])
+        if spill:
+            # the spill file is kept after a crash if there are checkpoints
+            keep = "checkpoint_interval" not in self.params or bool(self.params["checkpoint_interval"])
+            networks = dedup.NetworkSet(self.params["spill_dir"],keep)
+        else:
+            networks = set()
+        if state and "networks_offset" in state:
+            jsonl = os.path.join(self.perturbationsdir,"networks.jsonl")
+            networks.update(record["network"] for record in results.read_networks(jsonl,state["networks_offset"]))
+        elif state:
+            networks.update(state["finished"])
+        return networks
+
+    def _stats_file(self,state):
+        # stats.jsonl, the statistics of each finished seed network on one line; a resumed job drops the lines of
+        # seeds finished after its checkpoint, which it searches again
+        f = open(os.path.join(self.perturbationsdir,"stats.jsonl"),"a")
+        if state and "stats_offset" in state:
+            f.truncate(state["stats_offset"])
+        return f
+
+    def _save_stats(self,stats):
+        # timing and counters of the search
+        with open(os.path.join(self.perturbationsdir,"stats.json"),"w") as f:
+            json.dump(stats,f,indent=1)
+
+    def _collect_stats(self):
+        # stats.json with the lines of stats.jsonl as the list "seeds", written one seed at a time; stats.jsonl is
+        # removed after the checkpoint that refers to it
+        fname = os.path.join(self.perturbationsdir,"stats.jsonl")
+        if not os.path.exists(fname):
+            return
+        with open(fname) as lines, open(os.path.join(self.perturbationsdir,"stats.json"),"w") as f:
+            f.write('{"seeds" : [')
+            for k,line in enumerate(lines):
+                f.write((",\n" if k else "\n") + line.rstrip("\n"))
+            f.write("\n]}\n")
+        os.remove(fname)
+
+    def run(self):
+        # seed networks are read as they are searched
+        networks = fileparsers.iterNetworkFile(self.params["networkfile"])
         sys.stdout.flush()
         self._parsefile('edge',fileparsers.parseEdgeFile)
         self._parsefile('node',fileparsers.parseNodeFile)
         print("\nNetwork search beginning.\n")
-        perturbed_networks = []
-        for network_spec in networks:
-            perturbed_networks.extend(networksearch.perturbNetwork(self.params,network_spec))
-        networks=list(set(perturbed_networks))
-        with open(os.path.join(self.perturbationsdir,"networks.txt"),"w") as f:
-            f.write(str(networks))
+        state = self.resume_state
+        perturbed_networks = self._accepted_networks(state)
+        writer = self._stream_writer()
+        store = self._results_store()
+        on_accept = self._on_accept(writer,store)
+        found = None
+        try:
+            if "concurrent_seeds" in self.params and self.params["concurrent_seeds"]:
+                # all seeds share one time and network budget
+                resume = state if state and "seeds" in state else None
+                save_state = self._checkpointer(0,[])
+                stats = {}
+                found = scheduler.perturbSeeds(self.params,list(networks),on_accept=on_accept,save_state=save_state,resume=resume,stats=stats)
+                perturbed_networks.update(found)
+                self._save_stats(stats)
+            else:
+                with self._stats_file(state) as stats_file:
+                    self.last_save = time.time()
+                    self.saved_search = state["seed_index"] if state and "networks" in state else None
+                    for k,network_spec in enumerate(networks):
+                        if state and k < state["seed_index"]:
+                            continue
+                        resume = state if state and k == state["seed_index"] and "networks" in state else None
+                        save_state = self._checkpointer(k,perturbed_networks,writer,stats_file)
+                        stats = {"seed" : network_spec}
+                        found = networksearch.perturbNetwork(self.params,network_spec,on_accept=on_accept,save_state=save_state,resume=resume,stats=stats)
+                        perturbed_networks.update(found)
+                        stats_file.write(json.dumps(stats) + "\n")
+                        stats_file.flush()
+                        if save_state and (self.saved_search == k or
+                                           checkpoint.due({"checkpoint_interval" : self._checkpoint_interval()},self.last_save)):
+                            # mark the start of the next seed, so that a resumed job does not repeat this seed; this
+                            # also replaces a checkpoint that needs the spilled networks of this seed, which are
+                            # deleted next
+                            mark = self._checkpointer(k+1,perturbed_networks,writer,stats_file)
+                            mark({})
+                        dedup.close(found)
+        finally:
+            if writer:
+                writer.close()
+            if store:
+                store.close()
+        results.write_network_list(os.path.join(self.perturbationsdir,"networks.txt"),perturbed_networks)
+        if os.path.exists(self.checkpointfile):
+            os.remove(self.checkpointfile)
+        self._collect_stats()
+        # spill files are deleted once no checkpoint refers to them
+        dedup.close(found)
+        dedup.close(perturbed_networks)
         print("\nNetwork search complete.\n")
         sys.stdout.flush()
 
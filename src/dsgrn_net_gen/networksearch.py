@@ -4,17 +4,34 @@ import dsgrn_utilities.graphtranslation as graphtranslation
 from functools import partial
 from inspect import getmembers, isfunction
 import dsgrn_net_gen.filters as filters
+import dsgrn_net_gen.parallel as parallel
+import dsgrn_net_gen.paramcache as paramcache
+import dsgrn_net_gen.paramcount as paramcount
+import dsgrn_net_gen.fingerprint as fingerprint
+import dsgrn_net_gen.workgraph as workgraph
+import dsgrn_net_gen.filterchain as filterchain
+import dsgrn_net_gen.checkpoint as checkpoint
+import dsgrn_net_gen.instrumentation as instrumentation
+import dsgrn_net_gen.enumeration as enumeration
+import dsgrn_net_gen.stopping as stopping
+import dsgrn_net_gen.candidates as candidates
+import dsgrn_net_gen.sampling as sampling
+import dsgrn_net_gen.supervisor as supervisor
+import dsgrn_net_gen.dedup as dedup
+import dsgrn_net_gen.walk as walk
+from collections import OrderedDict
 from copy import deepcopy
 
 #####################################################################################################################
 # Function for perturbing networks.
 #####################################################################################################################
 
-def perturbNetwork(params_init, network_spec):
+def perturbNetwork(params_init, network_spec, on_accept=None, save_state=None, resume=None, stats=None):
     '''
     Get a list of essential DSGRN network specifications perturbed around an essential seed network given parameters
-    in params (see below). Duplicate networks are possible because there is no graph isomorphism checking. Empirical
-    usage suggests that the number of duplicates is too small to warrant the computational cost of checking.
+    in params (see below). Perturbed graphs that repeat a previously checked graph reuse its verdict instead of being
+    checked again. Isomorphic networks with different node labels are all returned unless "collapse_isomorphic" is
+    True.
 
     :param params_init: params is a dictionary with the following key,value pairs.
         Required:
@@ -51,48 +68,213 @@ def perturbNetwork(params_init, network_spec):
                             Set to False to remove this bias.
                             NOTE: Can still get nodes without in- or out-edges if probabilities["removeEdge"] is nonzero
         "random_seed" : random seed (set to time.time() for stochastic results in make_jobs.py)
+        "workers" : integer number of worker processes that generate and filter networks in parallel, default = 1
+                    (no worker processes). Each worker has its own pseudo-random stream derived from "random_seed",
+                    so that a fixed seed and number of workers always produces the same networks, provided the
+                    search is not halted by "time_to_wait".
+        "chunksize" : integer number of networks each worker perturbs before reporting back to the parent process,
+                      default = 100
+        "param_cache" : path to a sqlite file that stores the computability and number of DSGRN parameters of every
+                        checked network, so that repeated networks skip DSGRN in this and later searches,
+                        default = None (the sizes are only cached in memory)
+        "param_cache_size" : integer number of networks held in the in-memory cache, default = 100000
+        "estimate_params" : True or False (true or false in .json format), default = True, rejects networks with
+                            unsupported node topologies or too many parameters using the per-node parameter counts in
+                            paramcount.py, before the network spec and the DSGRN parameter graph are made
+        "dsgrn_limits" : dictionary of structural limits of the installed DSGRN that are checked on the perturbed graph
+                         before anything else, with optional keys
+                         "max_inedges" : integer, largest number of in-edges at a node, default = None (no limit)
+                         "max_outedges" : integer, largest number of out-edges at a node, default = None (no limit)
+                         "zero_outedges" : True or False, whether nodes with no out-edges are allowed,
+                                           default = whether the installed DSGRN computes such a node
+        "verdict_memo_size" : integer number of perturbed graphs whose verdicts (accepted or the warning message) are
+                              remembered, so that repeats of a graph are not translated and checked again,
+                              default = 100000. Set to 0 to check every perturbed graph.
+        "collapse_isomorphic" : True or False (true or false in .json format), default = False, keeps only one of the
+                                accepted networks that are the same up to relabelling of the nodes
+        "checkpoint_interval" : number of seconds between calls to save_state, default = 300. "always" calls save_state
+                                after every perturbed network (after every merged chunk with "workers" > 1), and 0 or
+                                None never calls it.
+        "adaptive_filters" : True or False (true or false in .json format), default = False, reorders the checks of a
+                             perturbed network (DSGRN limits, parameter estimate, DSGRN computability and the filters)
+                             as the search runs, so that checks that reject many networks cheaply run first.
+                             Every rejected network is still counted once, so the total number of warnings is the
+                             same, but a network that fails several checks is counted under the warning of the first
+                             check that runs. The counts of the individual warnings therefore differ from a search
+                             without "adaptive_filters", and the user filters only run ahead of the DSGRN checks with
+                             it.
+        "mode" : "sample", "enumerate" or "walk", default = "sample". "sample" perturbs the seed network at random.
+                 "enumerate" checks every distinct graph within the largest number of operations in range_operations,
+                 using the operations with nonzero probability, and stops when the neighborhood is exhausted
+                 (see enumeration.py). "walk" perturbs recently accepted networks instead of the seed, so that small
+                 range_operations reach networks farther from the seed (see walk.py). Enumeration and walks run in
+                 this process and are not checkpointed. scheduler.perturbSeeds ("concurrent_seeds" in a Job) only
+                 samples and raises a ValueError for the other modes.
+        "walk_max_distance" : integer, default = None (no limit). In walk mode, networks that differ from the seed in
+                              more than this many nodes and edges are rejected with the warning "Too far from seed".
+        "walk_pool_size" : integer, default = 100. In walk mode, the number of recently accepted networks that are
+                           perturbed.
+        "early_stop" : False, True, or a dictionary with any of the keys "window" (default 10000), "min_rate"
+                       (default 1e-4) and "min_perturbed" (default 1000), default = False. If set, the search stops
+                       before numneighbors or time_to_wait when no new network was accepted in the last window
+                       perturbations, or when the estimated probability that a perturbation gives a new network is
+                       below min_rate (see stopping.py). The reason for stopping is printed and added to stats.
+        "sampler" : "python" or "numpy", default = "python". "numpy" draws the numbers of operations for "chunksize"
+                    perturbed graphs at a time with NumPy (see sampling.py), from the same distribution but with
+                    different draws than "python". Requires numpy.
+        "eval_timeout" : number of seconds, default = None. If set, the DSGRN parameter graph of each network is made
+                         in a child process (see supervisor.py) that is killed if it takes longer than this, and the
+                         network is rejected with the warning "Evaluation timeout". The child process is restarted for
+                         the next network.
+        "spill_networks" : True or False (true or false in .json format), default = False. If True, only 128-bit
+                           fingerprints of the accepted networks are kept in memory and the network specifications are
+                           written to a temporary file in "spill_dir" (default = the system temporary directory). The
+                           search then returns the set itself, which reads them back from the file when iterated, and
+                           checkpoints hold the path and length of the file instead of the networks (see dedup.py).
+        "eval_max_rss" : number of megabytes, default = None. As "eval_timeout", for the resident memory of the child
+                         process (Linux only). Either key turns on supervised evaluation.
     :param network_spec: DSGRN network specification string
-    :return: list of essential DSGRN network specification strings
+    :param on_accept: optional function called with each network specification when it is accepted, for example to
+                      write networks to a file as they are found, and with the keyword arguments "params" (number of
+                      DSGRN parameters, or None if unknown), "nodes", "edges", "seed" (the seed network specification)
+                      and "operations" (the numbers of addNode, addEdge, removeEdge and removeNode operations that made
+                      the network from the seed, or None in enumerate and walk modes)
+    :param save_state: optional function called with a JSON-serializable dictionary of the state of the search every
+                       params["checkpoint_interval"] seconds, for example to write a checkpoint
+    :param resume: optional dictionary saved by save_state; the search continues from that state instead of starting over
+    :param stats: optional dictionary that is filled with statistics of the search: the number of perturbed networks,
+                  accepted networks, elapsed seconds, warning counts, the time, calls and rejections of each check,
+                  the time and calls of the steps of the search (perturbing the graph, making the network spec, and
+                  making the DSGRN network and parameter graph), and samples of the number of perturbed and
+                  accepted networks over time
+    :return: list of essential DSGRN network specification strings, or with "spill_networks" a dedup.NetworkSet of
+             them, whose file is deleted when it is closed or, without save_state, garbage collected
 
     '''
 
 
     # Initialize
     params = deepcopy(params_init) # required for makejobs.run() to work
-    networks = set([])
     params, starting_graph = setup(params,network_spec)
+    params["on_accept"] = on_accept
+    params["save_state"] = save_state
     sanity_check_edges(network_spec,starting_graph)
-    starting_netspec = graphtranslation.createEssentialNetworkSpecFromGraph(starting_graph)
-    if enforce_filters(starting_graph,starting_netspec,params):
-        # add the starting network if it meets the filtering criteria
-        networks.add(starting_netspec)
-    start_time = time.time()
-    count = 0
+    if resume:
+        # continue a saved search
+        networks = restore_state(params,resume,keep=bool(save_state))
+        start_time = time.time() - resume["elapsed"]
+        count = resume["count"]
+    else:
+        # the spilled networks of a checkpointed search outlive a crash
+        networks = dedup.make_network_set(params,keep=bool(save_state))
+        starting_netspec = graphtranslation.createEssentialNetworkSpecFromGraph(starting_graph)
+        if enforce_filters(starting_graph,starting_netspec,params):
+            # add the starting network if it meets the filtering criteria
+            add_network(networks,starting_netspec,params,network_info(starting_graph,starting_netspec,params,[0,0,0,0]))
+        start_time = time.time()
+        count = 0
+    working_graph = workgraph.WorkGraph.from_graph(starting_graph)
 
     # Perturb
-    while (len(networks) < params['numneighbors']) and (time.time()-start_time < params['time_to_wait']):
-        count += 1
-        # add nodes and edges based on params and get the network spec for the new graph
-        graph = perform_operations(starting_graph.clone(),params)
-        if graph:
-            netspec = graphtranslation.createEssentialNetworkSpecFromGraph(graph)
-            # check that the network spec is DSGRN computable with few enough parameters and satisfies user-supplied filters
-            if enforce_filters(graph,netspec,params):
-                networks.add(netspec)
-        else:
-            params["msg_dict"]["Aborted"] += 1
-        if not count%1000 and params["compressed_output"]:
-            update_line(params["msg_dict"],len(networks))
+    if params["mode"] == "enumerate":
+        # check the whole neighborhood of the seed network once
+        count = enumeration.enumerate_networks(working_graph,params,networks,start_time)
+    elif params["mode"] == "walk":
+        # perturb recently accepted networks instead of the seed
+        count = walk.walk_networks(working_graph,params,networks,start_time)
+    elif params["workers"] > 1:
+        # generate and filter networks in worker processes
+        count = parallel.perturb(params_init,network_spec,params,networks,start_time,resume)
+    else:
+        last_save = time.time()
+        stop = params["stopping"]
+        while (len(networks) < params['numneighbors']) and (time.time()-start_time < params['time_to_wait']):
+            count += 1
+            netspec = perturb_once(working_graph,params)
+            if netspec:
+                new = add_network(networks,netspec,params,params["accepted_info"])
+                if stop:
+                    stop.accept(netspec,new,count)
+            if stop and not count%100:
+                params["stop_reason"] = stop.check(count)
+                if params["stop_reason"]:
+                    break
+            if not count%1000 and params["compressed_output"]:
+                update_line(params["msg_dict"],len(networks))
+            params["timeline"].sample(time.time()-start_time,count,len(networks))
+            if save_state and checkpoint.due(params,last_save):
+                state = search_state(params,networks,start_time,count)
+                state["random_state"] = checkpoint.get_random_state()
+                if params["operation_sampler"]:
+                    state["operation_batch"] = list(params["operation_sampler"].batch)
+                save_state(state)
+                last_save = time.time()
+
+    params["param_cache"].flush()
+    if params["evaluator"]:
+        params["evaluator"].close()
 
     # last update of warnings
     if params["compressed_output"]:
         update_line(params["msg_dict"],len(networks))
 
     # inform user of the number of networks produced and return however many networks were made
-    if time.time()-start_time >= params['time_to_wait']:
-        print("\nProcess timed out.")
+    report_stop(params,networks,start_time)
     print("\nSaving {} networks.".format(len(networks)))
-    return list(networks)
+    if stats is not None:
+        stats.update(search_statistics(params,networks,start_time,count))
+    return dedup.search_result(networks)
+
+
+def report_stop(params,networks,start_time):
+    # record and print why the search ended
+    if params["stop_reason"]:
+        print("\nStopped early. {}.".format(params["stop_reason"]))
+    elif len(networks) >= params['numneighbors']:
+        params["stop_reason"] = "Found numneighbors networks"
+    elif time.time()-start_time >= params['time_to_wait']:
+        params["stop_reason"] = "Timed out"
+        print("\nProcess timed out.")
+    else:
+        params["stop_reason"] = "Neighborhood exhausted"
+
+
+def search_statistics(params,networks,start_time,count):
+    elapsed = time.time() - start_time
+    params["timeline"].sample(elapsed,count,len(networks),force=True)
+    warnings = {msg : num for msg,num in params["msg_dict"].items() if msg != "Accepted"}
+    return {"perturbed" : count, "accepted" : len(networks), "elapsed" : elapsed, "warnings" : warnings,
+            "stop_reason" : params["stop_reason"], "stages" : params["filter_chain"].statistics(),
+            "timers" : params["timers"].statistics(), "timeline" : params["timeline"].statistics()}
+
+
+def search_state(params,networks,start_time,count):
+    # JSON-serializable state for checkpoints
+    state = {"networks" : dedup.to_json(networks), "elapsed" : time.time() - start_time, "count" : count,
+             "msg_dict" : dict(params["msg_dict"])}
+    if params["stopping"]:
+        state["stopping"] = params["stopping"].to_json()
+    return state
+
+
+def restore_state(params,state,keep=False):
+    # returns the accepted networks of a saved search and restores the rest of its state in params
+    networks = dedup.from_json(params,state["networks"],keep)
+    if params["collapse_isomorphic"]:
+        for netspec in networks:
+            params["isoforms"].add(fingerprint.canonical_fingerprint(graphtranslation.getGraphFromNetworkSpec(netspec)))
+    params["msg_dict"].update(state["msg_dict"])
+    rule = params["stopping"]
+    if rule and "stopping" in state:
+        params["stopping"] = stopping.StoppingRule.from_json(state["stopping"],rule.window,rule.min_rate,rule.min_perturbed)
+    elif rule:
+        # checkpoint without the counts of the rule
+        rule.last_new = state["count"]
+    if state.get("random_state"):
+        checkpoint.set_random_state(state["random_state"])
+        if params["operation_sampler"]:
+            params["operation_sampler"].batch = [list(ops) for ops in state.get("operation_batch",[])]
+    return networks
 
 
 ##########################################################################################
@@ -110,11 +292,15 @@ def setup(params,network_spec):
     # remove negative self-regulation from edgelist
     if params["edgelist"]:
         params["edgelist"] = filter_edgelist(params["edgelist"])
+    # index the allowed edges by node label once for the whole search
+    params["edge_index"] = candidates.EdgeIndex(params["edgelist"]) if params["edgelist"] else None
     # make sure probabilities are normalized and take the cumsum
     params["probabilities"] = make_probability_vector(params["probabilities"])
     # make range_operations end-point inclusive
     params["range_operations"] = [params["range_operations"][0],params["range_operations"][1]+1]
     random.seed(params["random_seed"])
+    params["operation_sampler"] = sampling.make_sampler(params)
+    params["seed_network"] = network_spec
     return params, starting_graph
 
 
@@ -125,21 +311,22 @@ def set_defaults(params,starting_graph):
         nodeset = set(params["nodelist"])
         for v in starting_graph.vertices():
             nodeset.add(starting_graph.vertex_label(v))
-        params["nodelist"] = list(nodeset)
+        params["nodelist"] = sorted(nodeset)
     if "edgelist" not in params or not params["edgelist"]:
         params["edgelist"] = []
     else:
         edgeset = set(params["edgelist"])
         for (u,v) in starting_graph.edges():
             edgeset.add((starting_graph.vertex_label(u),starting_graph.vertex_label(v),starting_graph.edge_label(u,v)))
-        params["edgelist"] = list(edgeset)
+        params["edgelist"] = sorted(edgeset)
     if "time_to_wait" not in params:
         params["time_to_wait"] = 30
     if "filters" not in params:
         params["filters"] = [partial(filters.is_connected,kwargs={})]
     else:
         names = list(params["filters"].keys())
-        funcs = [o for o in getmembers(filters) if isfunction(o[1]) and o[0] in names]
+        # helpers of filters.py start with an underscore and are not filters
+        funcs = [o for o in getmembers(filters) if isfunction(o[1]) and o[0] in names and not o[0].startswith("_")]
         not_implemented = set(names).difference([o[0] for o in funcs])
         if not_implemented:
             raise ValueError("\nFilter(s) {} not implemented in filters.py. Please correct the name or add a function.\n".format(not_implemented))
@@ -149,9 +336,67 @@ def set_defaults(params,starting_graph):
     params["msg_dict"] = {"Accepted" : 0, "Aborted" : 0}
     if "DSGRN_optimized" not in params:
         params["DSGRN_optimized"] = True
+    if "workers" not in params or not params["workers"]:
+        params["workers"] = 1
+    if "chunksize" not in params:
+        params["chunksize"] = 100
+    if "checkpoint_interval" not in params:
+        params["checkpoint_interval"] = 300
+    if isinstance(params["checkpoint_interval"],str) and params["checkpoint_interval"] != "always":
+        raise ValueError("\nUnknown checkpoint_interval {}. Choose a number of seconds or \"always\".\n".format(params["checkpoint_interval"]))
+    if "mode" not in params:
+        params["mode"] = "sample"
+    if "early_stop" not in params:
+        params["early_stop"] = False
+    params["stopping"] = stopping.make_rule(params["early_stop"])
+    if "sampler" not in params:
+        params["sampler"] = "python"
+    params["stop_reason"] = ""
+    if params["mode"] not in ["sample","enumerate","walk"]:
+        raise ValueError("\nUnknown mode {}. Choose \"sample\", \"enumerate\" or \"walk\".\n".format(params["mode"]))
+    if "walk_max_distance" not in params:
+        params["walk_max_distance"] = None
+    if "walk_pool_size" not in params:
+        params["walk_pool_size"] = 100
+    if "param_cache_size" not in params:
+        params["param_cache_size"] = 100000
+    params["param_cache"] = paramcache.get_cache(params.get("param_cache"),params["param_cache_size"])
+    if "estimate_params" not in params:
+        params["estimate_params"] = True
+    for key in ["eval_timeout","eval_max_rss"]:
+        if key not in params:
+            params[key] = None
+    params["evaluator"] = supervisor.make_evaluator(params)
+    params["dsgrn_limits"] = set_dsgrn_limits(params.get("dsgrn_limits"))
+    if "verdict_memo_size" not in params:
+        params["verdict_memo_size"] = 100000
+    params["verdicts"] = OrderedDict() if params["verdict_memo_size"] else None
+    if "spill_networks" not in params:
+        params["spill_networks"] = False
+    if "spill_dir" not in params:
+        params["spill_dir"] = None
+    if "collapse_isomorphic" not in params:
+        params["collapse_isomorphic"] = False
+    params["isoforms"] = dedup.FingerprintSet()
+    if "adaptive_filters" not in params:
+        params["adaptive_filters"] = False
+    params["filter_chain"] = make_filter_chain(params)
+    params["timers"] = instrumentation.Timers()
+    params["timeline"] = instrumentation.Timeline()
     return params
 
 
+def set_dsgrn_limits(limits):
+    limits = dict(limits) if limits else {}
+    for key in ["max_inedges","max_outedges"]:
+        if key not in limits:
+            limits[key] = None
+    if "zero_outedges" not in limits or limits["zero_outedges"] is None:
+        # ask DSGRN about a node with one in-edge and no out-edges
+        limits["zero_outedges"] = paramcount.node_factor((1,),0) is not None
+    return limits
+
+
 def filter_edgelist(edgelist):
     # filter edgelist to remove negative self-loops
     el = edgelist[:]
@@ -182,39 +427,193 @@ def sanity_check_edges(network_spec,starting_graph):
 # Filtering and warning functions
 ##########################################################################################
 
+def perturb_once(starting_graph,params):
+    # add nodes and edges based on params and get the network spec for the new graph; the metadata of an accepted
+    # network is left in params["accepted_info"]
+    start = time.perf_counter()
+    numops = choose_operations(params)
+    graph = perform_operations(starting_graph.clone(),params,numops)
+    params["timers"].add("perform_operations",start)
+    if not graph:
+        params["msg_dict"]["Aborted"] += 1
+        return None
+    return check_perturbed(graph,params,numops)
+
+
+def check_perturbed(graph,params,numops):
+    # network spec of a perturbed graph if it passes every check, otherwise None
+    verdicts = params["verdicts"]
+    key = fingerprint.fingerprint(graph) if verdicts is not None else None
+    if key is not None and key in verdicts:
+        # the same labelled graph was checked before, reuse the verdict
+        verdicts.move_to_end(key)
+        netspec, msg = verdicts[key]
+    else:
+        netspec, msg = evaluate(graph,params)
+        if key is not None:
+            verdicts[key] = (None if msg else netspec, msg)
+            if len(verdicts) > params["verdict_memo_size"]:
+                verdicts.popitem(last=False)
+    if msg:
+        warn(msg,graph,netspec,params)
+        return None
+    params["accepted_info"] = network_info(graph,netspec,params,numops)
+    return netspec
+
+
+def network_info(graph,netspec,params,numops):
+    # metadata of an accepted network that is passed to on_accept
+    cached = params["param_cache"].get(netspec)
+    return {"params" : cached[1] if cached else None, "nodes" : len(graph.vertices()), "edges" : len(graph.edges()),
+            "seed" : params["seed_network"], "operations" : numops}
+
+
+def evaluate(graph,params):
+    # returns (netspec, "") if the graph passes every check, otherwise (netspec or None, warning message)
+    return params["filter_chain"](graph,params)
+
+
+def make_filter_chain(params):
+    # cheap checks on the graph come first, then DSGRN computability and user-supplied filters on the network spec
+    stages = [filterchain.Stage("DSGRN limits",structure_stage)]
+    if params["estimate_params"]:
+        stages.append(filterchain.Stage("parameter estimate",estimate_stage))
+    stages.append(filterchain.Stage("DSGRN computability",computability_stage))
+    for fil in params["filters"]:
+        if fil.func.__name__ in filters.WORKGRAPH_FILTERS:
+            stages.append(filterchain.Stage(fil.func.__name__,partial(filter_stage,fil)))
+        else:
+            stages.append(filterchain.Stage(fil.func.__name__,partial(translated_filter_stage,fil)))
+    return filterchain.FilterChain(stages,params["adaptive_filters"])
+
+
+def structure_stage(candidate,params):
+    return structure_warning(params,candidate.graph)
+
+
+def estimate_stage(candidate,params):
+    return param_estimate_warning(params,candidate.graph)
+
+
+def computability_stage(candidate,params):
+    return computability_warning(params,candidate.netspec())
+
+
+def filter_stage(fil,candidate,params):
+    isgood, message = fil(candidate.graph)
+    return "" if isgood else message
+
+
+def translated_filter_stage(fil,candidate,params):
+    isgood, message = fil(candidate.gtgraph())
+    return "" if isgood else message
+
+
+def add_network(networks,netspec,params,info=None):
+    # add an accepted network, skipping networks isomorphic to an accepted one if requested
+    if netspec in networks:
+        return False
+    if params["collapse_isomorphic"]:
+        form = fingerprint.canonical_fingerprint(graphtranslation.getGraphFromNetworkSpec(netspec))
+        if form in params["isoforms"]:
+            return False
+        params["isoforms"].add(form)
+    networks.add(netspec)
+    if params.get("on_accept"):
+        params["on_accept"](netspec,**(info or {}))
+    return True
+
+
 def enforce_filters(graph,netspec,params):
-    if check_computability(params, netspec):
-        if not params["filters"] or user_filtering(graph, params, netspec):
-            return True
-    return False
+    msg = computability_warning(params,netspec) or filter_warning(graph,params)
+    if msg:
+        add_warning(msg, netspec, params["compressed_output"], params["msg_dict"])
+        return False
+    return True
 
 
-def check_computability(params,network_spec):
+def computability_warning(params,network_spec):
     if not network_spec:
-        msg = "Not computable"
-        add_warning(msg, network_spec, params["compressed_output"], params["msg_dict"])
-        return False
+        return "Not computable"
+    cached = params["param_cache"].get(network_spec)
+    if cached is None:
+        if params["evaluator"]:
+            # in a child process that is killed if it goes over the time or memory limit
+            start = time.perf_counter()
+            cached = params["evaluator"](network_spec)
+            params["timers"].add("supervised evaluation",start)
+            if cached is None:
+                return "Evaluation timeout"
+        else:
+            cached = paramgraph_size(network_spec,params["timers"])
+        params["param_cache"].put(network_spec, *cached)
+    computable, size = cached
+    if not computable:
+        return "Not computable"
+    if size > params['maxparams']:
+        return "Too many params"
+    return ""
+
+
+def structure_warning(params,graph):
+    # reject degrees that the installed DSGRN cannot compute using only the edges of the graph
+    limits = params["dsgrn_limits"]
+    if limits["zero_outedges"] and limits["max_inedges"] is None and limits["max_outedges"] is None:
+        return ""
+    indegree = dict.fromkeys(graph.vertices(),0)
+    outdegree = dict.fromkeys(graph.vertices(),0)
+    if not outdegree:
+        return ""
+    for (u,v) in graph.edges():
+        outdegree[u] += 1
+        indegree[v] += 1
+    if (limits["max_inedges"] is not None and max(indegree.values()) > limits["max_inedges"]) or \
+            (limits["max_outedges"] is not None and max(outdegree.values()) > limits["max_outedges"]) or \
+            (not limits["zero_outedges"] and min(outdegree.values()) == 0):
+        return "Not computable"
+    return ""
+
+
+def param_estimate_warning(params,graph):
+    # reject using the per-node parameter counts without making DSGRN objects
+    computable, size = paramcount.estimate(graph)
+    if not computable:
+        return "Not computable"
+    if size > params['maxparams']:
+        return "Too many params"
+    return ""
+
+
+def paramgraph_size(network_spec,timers=None):
+    # returns (computable, number of DSGRN parameters)
+    start = time.perf_counter()
     network = DSGRN.Network(network_spec)
+    if timers is not None:
+        timers.add("DSGRN.Network",start)
+        start = time.perf_counter()
     try:
         paramgraph=DSGRN.ParameterGraph(network)
-        smallenough = paramgraph.size() <= params['maxparams']
-        if not smallenough:
-            msg = "Too many params"
-            add_warning(msg,network_spec, params["compressed_output"], params["msg_dict"])
-        return smallenough
+        return True, paramgraph.size()
     except (AttributeError, RuntimeError):
-        msg = "Not computable"
-        add_warning(msg, network_spec, params["compressed_output"], params["msg_dict"])
-        return False
+        return False, 0
+    finally:
+        if timers is not None:
+            timers.add("DSGRN.ParameterGraph",start)
 
 
-def user_filtering(graph,params,netspec):
-     for fil in params["filters"]:
+def filter_warning(graph,params):
+    for fil in params["filters"]:
         isgood, message = fil(graph)
         if not isgood:
-            add_warning(message, netspec, params["compressed_output"], params["msg_dict"])
-            return False
-     return True
+            return message
+    return ""
+
+
+def warn(msg,graph,netspec,params):
+    # only make the network spec for rejected graphs when it is printed
+    if not netspec and not params["compressed_output"]:
+        netspec = graphtranslation.createEssentialNetworkSpecFromGraph(workgraph.to_graph(graph))
+    add_warning(msg, netspec, params["compressed_output"], params["msg_dict"])
 
 
 def add_warning(msg,network_spec,compressed_output,msg_dict):
@@ -242,9 +641,10 @@ def update_line(msg_dict,N):
 # Stochastic numbers of additional edges and/or nodes to perturb the network.
 ##############################################################################
 
-def perform_operations(graph,params):
+def perform_operations(graph,params,numops=None):
     # choose the number of each type of operation
-    numops = choose_operations(params)
+    if numops is None:
+        numops = choose_operations(params)
     # apply operations in the proper order
     if graph:
         graph,num_edges = removeNodes(graph,numops[3])
@@ -255,16 +655,19 @@ def perform_operations(graph,params):
         if ne > 0:
             graph = removeEdges(graph,ne)
     if numops[0] and graph is None:
-        graph = graphtranslation.Graph()
+        graph = workgraph.WorkGraph()
     graph = addNodes(graph, params["nodelist"],numops[0])
     if graph and params["DSGRN_optimized"]:
-        graph = addEdges_DSGRN_optimized(graph,params["edgelist"],numops[1])
+        graph = addEdges_DSGRN_optimized(graph,params["edge_index"],numops[1])
     elif graph:
-        graph = addEdges(graph, params["edgelist"], numops[1])
+        graph = addEdges(graph, params["edge_index"], numops[1])
     return graph
 
 
 def choose_operations(params):
+    if params["operation_sampler"]:
+        # batched draws
+        return params["operation_sampler"]()
     # choose a random number of graph additions or swaps
     numadds = random.randrange(*params["range_operations"])
     # generate operations with probabilities as given in params
@@ -283,7 +686,7 @@ def choose_operations(params):
 ################################################################################################
 
 def removeEdges(graph,numedges):
-    if len(graph.edges()) <= numedges:
+    if numEdges(graph) <= numedges:
         return None
     for _ in range(numedges):
         graph.remove_edge(*random.choice(graph.edges()))
@@ -296,7 +699,9 @@ def removeNodes(graph,numnodes):
     numedges = 0
     for _ in range(numnodes):
         node = random.choice(list(graph.vertices()))
-        numedges += sum([1 for e in graph.edges() if node in e])
+        # count the edges at the node once, including a self-loop
+        outedges = graph.adjacencies(node)
+        numedges += len(outedges) + len(graph.inedges(node)) - (node in outedges)
         graph.remove_vertex(node)
     return graph,numedges
 
@@ -305,20 +710,19 @@ def addNodes(graph,nodelist,numnodes):
     # if nodelist, choose numnodes random nodes from nodelist
     # if no nodelist, make up names for new nodes
     for _ in range(numnodes):
-        networknodenames = getNetworkLabels(graph)
-        N = len(networknodenames)
+        N = len(graph.vertices())
 
         if not nodelist:
             # make unique node name
+            networknodenames = getNetworkLabels(graph)
             newnodelabel = 'x'+str(N+1)
             c=1
             while newnodelabel in networknodenames:
                 newnodelabel = 'x'+str(N+1+c)
                 c+=1
         else:
-            # filter nodelist to get only new nodes
-            nl = [ n for n in nodelist if n not in networknodenames ]
-            newnodelabel = getRandomListElement(nl)
+            # choose a node from nodelist that is not in the graph
+            newnodelabel = candidates.draw(nodelist,lambda n: graph.get_vertex_from_label(n) is None)
 
         # add to graph
         if newnodelabel:
@@ -326,71 +730,61 @@ def addNodes(graph,nodelist,numnodes):
     return graph
 
 
-def addEdges(graph,edgelist,numedges):
-    # if no edgelist, then a random edge is added to the network
-    # if edgelist is specified, a random choice is made from the filtered edgelist
+def addEdges(graph,edgeindex,numedges):
+    # if no edgeindex, then a random edge is added to the network
+    # if edgeindex is specified, a random choice is made from the edges of the edge list between nodes of the graph
     # (repressing self-loops removed)
     # numedges = number of edges to add
 
     # get info from graph
-    networknodenames = getNetworkLabels(graph)
-    N = len(networknodenames)
-    edges = set([(v, a, graph.edge_label(v, a)) for (v, a) in graph.edges()])
+    N = len(graph.vertices())
 
     # get allowable edges for this graph
-    if edgelist:
-        el = list(set([tuple(getVertexFromLabel(graph, e[:2]) + [e[2]]) for e in edgelist if set(e[:2]).issubset(
-            networknodenames)]).difference(edges))
+    if edgeindex:
+        el = edgeindex.pool(getNetworkLabels(graph))
 
     # add edges
     for _ in range(numedges):
-        # choose an edge from the list
-        if edgelist:
-            while el:
-                newedge = getRandomListElement(el)
-                if newedge:
-                    el.remove(newedge)
-                    if newedge[:2] not in graph.edges():
-                        graph.add_edge(*newedge)
-                        break
-                else:
-                    # punt if can't add an edge
-                    return None
+        # choose an edge from the list that joins two nodes without an edge
+        if edgeindex:
+            newedge = candidates.draw(el,lambda e: not graph.has_edge(*getVertexFromLabel(graph,e[:2])))
+            if not newedge:
+                # no more edges can be added
+                break
+            graph.add_edge(*getVertexFromLabel(graph,newedge[:2]),newedge[2])
         # otherwise produce random edge that is not a negative self-loop
         else:
-            if len(graph.edges()) == len(graph.vertices())**2:
+            if numEdges(graph) == N**2:
                 # stop if graph is complete
                 return None
             newedge = getRandomEdge(N)
-            while newedge[:2] in graph.edges() or (newedge[0]==newedge[1] and newedge[2]=='r'):
+            while graph.has_edge(newedge[0],newedge[1]) or (newedge[0]==newedge[1] and newedge[2]=='r'):
                 newedge = getRandomEdge(N)
             # since graph is not complete, an edge can always be added
-            edges.add(newedge)
             graph.add_edge(*newedge)
     return graph
 
 
-def addConnectingEdges(graph, nodes, edgelist):
+def addConnectingEdges(graph, nodes, edgeindex):
     # add connecting edges for nodes in list
 
     # get info from graph
-    networknodenames = getNetworkLabels(graph)
+    networknodenames = set(getNetworkLabels(graph))
     N = len(networknodenames)
 
     # add edges for prioritized nodes, punt if edges cannot be constructed
     need = getMissingEdges(graph,nodes)
     while need:
-        nv, edge_type = getRandomListElement(need)
+        nv, edge_type = need[random.randrange(len(need))]
         n = graph.vertex_label(nv)
-        if edgelist:
+        if edgeindex:
             if edge_type == "in":
-                el_in = [tuple(getVertexFromLabel(graph, e[:2]) + [e[2]]) for e in edgelist if n == e[1] and e[0] in networknodenames]
-                newedge = getRandomListElement(el_in)
+                newedge = candidates.draw(edgeindex.inedges(n),lambda e: e[0] in networknodenames)
             else:
-                el_out = [tuple(getVertexFromLabel(graph, e[:2]) + [e[2]]) for e in edgelist if n == e[0] and e[1] in networknodenames]
-                newedge = getRandomListElement(el_out)
+                newedge = candidates.draw(edgeindex.outedges(n),lambda e: e[1] in networknodenames)
             if not newedge:
                 return None
+            newedge = tuple(getVertexFromLabel(graph, newedge[:2]) + [newedge[2]])
         else:
             newv, newr = getHalfEdge(nv,N)
             if edge_type == "in":
@@ -402,21 +796,21 @@ def addConnectingEdges(graph, nodes, edgelist):
     return graph
 
 
-def addEdges_DSGRN_optimized(graph,edgelist,numedges):
+def addEdges_DSGRN_optimized(graph,edgeindex,numedges):
     # prioritize nodes with missing in- and out-edges, and return None if there aren't enough edge perturbations
     # to correct them all
-    # if no edgelist, then a random edge is added to the network
-    # if edgelist is specified, a random choice is made from the filtered edgelist
+    # if no edgeindex, then a random edge is added to the network
+    # if edgeindex is specified, a random choice is made from the edges of the edge list
     # (repressing self-loops removed)
 
     # record original number of edges
-    M0 = len(graph.edges())
+    M0 = numEdges(graph)
     # add prioritized edges
-    graph = addConnectingEdges(graph, graph.vertices(), edgelist)
+    graph = addConnectingEdges(graph, graph.vertices(), edgeindex)
     if not graph:
         return None
     # adjust number of perturbations
-    M1 = len(graph.edges())
+    M1 = numEdges(graph)
     numedges -= (M1-M0)
 
     if numedges < 0:
@@ -427,7 +821,7 @@ def addEdges_DSGRN_optimized(graph,edgelist,numedges):
         return graph
     else:
         # add remaining perturbations
-        return addEdges(graph, edgelist, numedges)
+        return addEdges(graph, edgeindex, numedges)
 
 
 
@@ -441,6 +835,9 @@ def getNetworkLabels(graph):
         return []
     return [ graph.vertex_label(v) for v in graph.vertices() ]
 
+def numEdges(graph):
+    return sum(len(graph.adjacencies(v)) for v in graph.vertices())
+
 def getVertexFromLabel(graph,nodelabels):
     return [ graph.get_vertex_from_label(n) for n in nodelabels ]
 
@@ -457,11 +854,6 @@ def getRandomReg():
     regbool = random.randrange(2)
     return 'a'*regbool + 'r'*(not regbool)
 
-def getRandomListElement(masterlist):
-    # pick randomly from list
-    if not masterlist: return None
-    else: return random.choice(sorted(masterlist))
-
 def getHalfEdge(n,N):
     newv, newr = getRandomNode(N), getRandomReg()
     while newv == n and newr == "r":
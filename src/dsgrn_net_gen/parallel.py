@@ -0,0 +1,192 @@
+import random, time, queue, multiprocessing
+# networksearch imports this module; a from-import also works while networksearch is partly initialized
+from dsgrn_net_gen import networksearch
+import dsgrn_net_gen.workgraph as workgraph
+import dsgrn_net_gen.checkpoint as checkpoint
+import dsgrn_net_gen.instrumentation as instrumentation
+from copy import deepcopy
+
+# number of chunks a worker stream may run ahead of the next chunk to merge
+WINDOW = 2
+
+#####################################################################################################################
+# Process-pool engine for perturbing networks.
+#####################################################################################################################
+
+def perturb(params_init, network_spec, params, networks, start_time, resume=None):
+    '''
+    Perturb the seed network in params["workers"] worker processes. Each worker process owns a pseudo-random stream
+    derived from params["random_seed"] and perturbs params["chunksize"] networks at a time. The parent process merges
+    the chunks in a fixed (chunk, stream) order, so that for a fixed random seed and number of workers the accepted
+    networks do not depend on process scheduling. A stream runs at most WINDOW chunks ahead of the next chunk to merge,
+    so that fast streams do not pile up unmerged chunks while a slow one catches up. The limits "numneighbors" and
+    "time_to_wait" are enforced over all workers together.
+
+    :param params_init: the parameter dictionary passed to networksearch.perturbNetwork
+    :param network_spec: DSGRN network specification string of the seed network
+    :param params: the initialized parameter dictionary from networksearch.setup; the warnings from the workers are
+                   merged into params["msg_dict"]
+    :param networks: set of accepted network specifications, updated in place
+    :param start_time: time.time() at the start of the search
+    :param resume: optional state saved by params["save_state"] during an earlier call; the streams continue from the
+                   saved chunks, so that the resumed search finds the same networks as an uninterrupted one
+    :return: the number of perturbed networks that were merged
+    '''
+    workers = params["workers"]
+    deadline = start_time + params["time_to_wait"]
+    results = queue.Queue()
+    # set when the search is done, so that the workers finish their chunks early
+    stop = multiprocessing.Event()
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(params_init, network_spec, stop))
+    # number of submitted chunks whose results have not been taken from the queue
+    outstanding = [0]
+
+    def submit(stream, chunk, state):
+        outstanding[0] += 1
+        pool.apply_async(perturb_chunk, (stream, chunk, state, deadline), callback=results.put,
+                         error_callback=results.put)
+
+    # random state of each stream after its last merged chunk, and the next chunk to merge
+    if resume and resume.get("streams"):
+        states = [checkpoint.json_to_random_state(state) for state in resume["streams"]]
+        chunk, stream = resume["chunk"], resume["stream"]
+        count = resume["count"]
+    else:
+        states = [stream_state(params["random_seed"], s) for s in range(workers)]
+        chunk, stream = 0, 0
+        count = 0
+    last_save = time.time()
+    try:
+        for s in range(workers):
+            submit(s, chunk + (s < stream), states[s])
+        pending = {}
+        # next chunk and random state of streams that are too far ahead
+        waiting = {}
+        while (len(networks) < params['numneighbors']) and (time.time() < deadline):
+            try:
+                result = results.get(timeout=min(1.0, max(deadline - time.time(), 0.01)))
+            except queue.Empty:
+                continue
+            outstanding[0] -= 1
+            if isinstance(result, Exception):
+                raise result
+            s, c, accepted, msg_dict, stats, n, state = result
+            pending[(c, s)] = (accepted, msg_dict, stats, n, state)
+            if c + 1 <= chunk + WINDOW:
+                submit(s, c + 1, state)
+            else:
+                waiting[s] = (c + 1, state)
+            # merge finished chunks in order; the stopping rule is checked after each chunk, so that the search
+            # stops at the same chunk however the results arrive
+            while (chunk, stream) in pending and len(networks) < params['numneighbors'] and not params["stop_reason"]:
+                accepted, msg_dict, stats, n, states[stream] = pending.pop((chunk, stream))
+                count += n
+                merge_chunk(params, networks, accepted, msg_dict, stats, count)
+                params["timeline"].sample(time.time() - start_time, count, len(networks))
+                if params["compressed_output"]:
+                    networksearch.update_line(params["msg_dict"], len(networks))
+                stream += 1
+                if stream == workers:
+                    chunk, stream = chunk + 1, 0
+                if params["stopping"]:
+                    params["stop_reason"] = params["stopping"].check(count)
+            if params["stop_reason"]:
+                break
+            for s, (c, state) in list(waiting.items()):
+                if c <= chunk + WINDOW:
+                    del waiting[s]
+                    submit(s, c, state)
+            if params["save_state"] and checkpoint.due(params, last_save):
+                state = networksearch.search_state(params, networks, start_time, count)
+                state.update({"streams" : [checkpoint.random_state_to_json(st) for st in states],
+                              "chunk" : chunk, "stream" : stream})
+                params["save_state"](state)
+                last_save = time.time()
+    finally:
+        stop.set()
+        shutdown(pool, results, outstanding[0])
+    return count
+
+
+def shutdown(pool, results, outstanding, timeout=30):
+    # wait for the chunks that are still running and let the workers exit; terminating a worker while it sends a
+    # result can leave the lock of the result queue held, so that the pool never finishes joining
+    end = time.time() + timeout
+    try:
+        while outstanding > 0:
+            results.get(timeout=max(end - time.time(), 0.01))
+            outstanding -= 1
+    except queue.Empty:
+        # a worker died with its chunk
+        pool.terminate()
+    else:
+        pool.close()
+    pool.join()
+
+
+def merge_chunk(params, networks, accepted, msg_dict, stats=None, perturbed=0):
+    # add accepted networks in the order they were found, stopping at numneighbors; returns the number of new networks
+    new = 0
+    for netspec, info in accepted:
+        if len(networks) >= params['numneighbors']:
+            break
+        added = networksearch.add_network(networks, netspec, params, info)
+        if params["stopping"]:
+            params["stopping"].accept(netspec, added, perturbed)
+        new += added
+    for msg, num in msg_dict.items():
+        if msg != "Accepted":
+            params["msg_dict"][msg] = params["msg_dict"].get(msg, 0) + num
+    if stats:
+        params["timers"].merge(stats["timers"])
+        params["filter_chain"].merge(stats["stages"])
+    return new
+
+
+def stream_state(random_seed, stream):
+    # independent reproducible pseudo-random stream for each worker
+    rng = random.Random("{}:{}".format(random_seed, stream))
+    return rng.getstate()
+
+
+##########################################################################################
+# Worker process functions
+##########################################################################################
+
+_worker = {}
+
+def init_worker(params_init, network_spec, stop=None):
+    # each worker makes its own copy of the initialized parameters and the starting graph
+    params, starting_graph = networksearch.setup(deepcopy(params_init), network_spec)
+    _worker["params"] = params
+    _worker["working_graph"] = workgraph.WorkGraph.from_graph(starting_graph)
+    _worker["stop"] = stop
+
+
+def perturb_chunk(stream, chunk, state, deadline):
+    params = _worker["params"]
+    accepted, msg_dict, stats, count = perturb_networks(params, _worker["working_graph"], state, deadline,
+                                                        _worker["stop"])
+    return stream, chunk, accepted, msg_dict, stats, count, random.getstate()
+
+
+def perturb_networks(params, working_graph, state, deadline, stop=None):
+    # perturb up to params["chunksize"] networks starting from the pseudo-random state, or fewer if the event stop is
+    # set; returns the accepted networks with their metadata, the warnings and the timers and filter statistics of
+    # this chunk, and the number of perturbed networks
+    params["msg_dict"] = {"Accepted" : 0, "Aborted" : 0}
+    timers, stages = params["timers"].statistics(), params["filter_chain"].statistics()
+    random.setstate(state)
+    if params["operation_sampler"]:
+        params["operation_sampler"].reset()
+    accepted = []
+    count = 0
+    while count < params["chunksize"] and time.time() < deadline and not (stop and stop.is_set()):
+        count += 1
+        netspec = networksearch.perturb_once(working_graph, params)
+        if netspec:
+            accepted.append((netspec, params["accepted_info"]))
+    params["param_cache"].flush()
+    stats = {"timers" : instrumentation.difference(params["timers"].statistics(), timers),
+             "stages" : instrumentation.difference(params["filter_chain"].statistics(), stages)}
+    return accepted, params["msg_dict"], stats, count
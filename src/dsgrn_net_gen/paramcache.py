@@ -0,0 +1,100 @@
+import hashlib, sqlite3, os
+from collections import OrderedDict
+
+#####################################################################################################################
+# Cache of DSGRN parameter graph sizes keyed by network specification.
+#####################################################################################################################
+
+# sqlite integers are signed 64-bit; parameter graphs this large are never accepted anyway
+MAXSIZE = 2**63 - 1
+# number of new sizes that are buffered in memory before they are written to the sqlite file
+BATCH = 100
+
+_caches = {}
+
+def get_cache(path=None, maxsize=100000):
+    '''
+    Get the parameter graph size cache for this process. Caches are shared between calls with the same path, so that
+    the in-memory layer stays warm across seed networks and jobs run in the same process.
+
+    :param path: path to a sqlite file holding the on-disk cache, or None for an in-memory cache only
+    :param maxsize: maximum number of network specifications held in memory
+    :return: ParamCache object
+    '''
+    key = os.path.abspath(os.path.expanduser(path)) if path else None
+    # sqlite connections must not be shared with forked worker processes
+    if key not in _caches or _caches[key].pid != os.getpid():
+        _caches[key] = ParamCache(key, maxsize)
+    cache = _caches[key]
+    cache.maxsize = maxsize
+    return cache
+
+
+def spec_key(network_spec):
+    # content address of a network spec; the order of the node lines does not change the parameter graph
+    lines = sorted(l.strip() for l in network_spec.strip().split("\n") if l.strip())
+    return hashlib.sha1("\n".join(lines).encode()).hexdigest()
+
+
+class ParamCache():
+    '''
+    Maps network specifications to (computable, number of DSGRN parameters), with a least-recently-used in-memory
+    layer in front of an optional sqlite file that persists across runs and is safe to share between processes.
+    New sizes are buffered and written to the file in one short transaction every BATCH sizes and at flush(), so that
+    no write lock is held between writes. If another process keeps the file locked past the timeout, the buffered
+    sizes are not saved to the file, and the search goes on.
+    '''
+
+    def __init__(self, path=None, maxsize=100000):
+        self.path = path
+        self.pid = os.getpid()
+        self.maxsize = maxsize
+        self.memory = OrderedDict()
+        self.unsaved = []
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=60)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS paramgraphs (key TEXT PRIMARY KEY, computable INTEGER, size INTEGER)")
+            self.db.commit()
+
+    def get(self, network_spec):
+        key = spec_key(network_spec)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+        if self.db is not None:
+            row = self.db.execute("SELECT computable, size FROM paramgraphs WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._remember(key, (bool(row[0]), row[1]))
+                self.hits += 1
+                return self.memory[key]
+        self.misses += 1
+        return None
+
+    def put(self, network_spec, computable, size):
+        key = spec_key(network_spec)
+        self._remember(key, (computable, size))
+        if self.db is not None:
+            self.unsaved.append((key, int(computable), min(size, MAXSIZE)))
+            if len(self.unsaved) >= BATCH:
+                self.flush()
+
+    def flush(self):
+        if self.db is not None and self.unsaved:
+            try:
+                with self.db:
+                    self.db.executemany("INSERT OR REPLACE INTO paramgraphs VALUES (?,?,?)", self.unsaved)
+            except sqlite3.OperationalError:
+                # the file stayed locked; the sizes are still in memory
+                pass
+            self.unsaved = []
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
@@ -0,0 +1,75 @@
+import DSGRN
+
+#####################################################################################################################
+# Per-node estimate of the size of a DSGRN parameter graph.
+#####################################################################################################################
+
+# The size of a DSGRN parameter graph is the product over the nodes of a factor that depends only on the logic of the
+# in-edges of the node and on its number of out-edges. The table maps (logic, outdegree) to the factor, or to None if
+# the installed DSGRN does not support the topology. Each topology is computed once per process from a small probe
+# network, so that later candidates are estimated with dictionary lookups.
+FACTORS = {}
+
+
+def estimate(graph):
+    '''
+    Get the number of DSGRN parameters of a graph without building a network specification or a parameter graph.
+
+    :param graph: A dsgrn_utilities.graphtranslation object
+    :return: (computable, number of parameters), where computable is False if some node has a topology that is not
+             supported by DSGRN. If DSGRN does not report the sizes of the individual nodes, the number of parameters
+             is a lower bound.
+    '''
+    size = 1
+    for v in graph.vertices():
+        factor = node_factor(*node_topology(graph, v))
+        if factor is None:
+            return False, 0
+        size *= factor
+    return True, size
+
+
+def node_topology(graph, v):
+    # activating edges are summed in one term and each repressing edge is its own term
+    # (see graphtranslation.createEssentialNetworkSpecFromGraph)
+    acts = 0
+    reps = 0
+    for u in graph.inedges(v):
+        if graph.edge_label(u, v) == "r":
+            reps += 1
+        else:
+            acts += 1
+    logic = tuple(sorted(([acts] if acts else []) + [1]*reps, reverse=True))
+    return logic, len(graph.adjacencies(v))
+
+
+def node_factor(logic, outdegree):
+    key = (logic, outdegree)
+    if key not in FACTORS:
+        FACTORS[key] = probe_factor(logic, outdegree)
+    return FACTORS[key]
+
+
+def probe_factor(logic, outdegree):
+    # Build the smallest network with a node X of the requested topology. X is the first node, its sources only
+    # regulate themselves and X, and its targets only X and themselves, which DSGRN always supports.
+    terms = []
+    lines = []
+    s = 0
+    for termsize in logic:
+        sources = ["S{}".format(s + k) for k in range(termsize)]
+        terms.append("(" + " + ".join(sources) + ")")
+        lines.extend(["{} : ({}) : E".format(n, n) for n in sources])
+        s += termsize
+    targets = ["T{}".format(k) for k in range(outdegree)]
+    lines.extend(["{} : (X + {}) : E".format(n, n) for n in targets])
+    spec = "\n".join(["X : {} : E".format("".join(terms))] + lines)
+    try:
+        paramgraph = DSGRN.ParameterGraph(DSGRN.Network(spec))
+    except (AttributeError, RuntimeError):
+        return None
+    try:
+        return paramgraph.logicsize(0) * paramgraph.ordersize(0)
+    except AttributeError:
+        # older DSGRN without per-node sizes; 1 is a lower bound for a supported node
+        return 1
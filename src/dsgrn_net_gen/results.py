@@ -0,0 +1,208 @@
+import json, os, sqlite3, time
+import dsgrn_net_gen.dedup as dedup
+import dsgrn_net_gen.fingerprint as fingerprint
+
+#####################################################################################################################
+# Line-delimited output of accepted networks.
+#####################################################################################################################
+
+class NetworkWriter():
+    '''
+    Appends each accepted network to a file of JSON records, one per line, as soon as it is found. The file is
+    flushed every flush_every records and flushed and synced to disk at least every sync_interval seconds, so that
+    an interrupted search loses at most the last few networks. Calling the writer with a network writes it only if
+    it has not been written before. If the file exists, for example when a job is resumed, new records are appended
+    and the networks already in the file are not written again.
+    '''
+
+    def __init__(self, fname, flush_every=100, sync_interval=10.0):
+        self.fname = fname
+        # fingerprints of the written networks
+        self.written = dedup.FingerprintSet()
+        if os.path.exists(fname):
+            truncate_partial_record(fname)
+            for record in read_networks(fname):
+                self.written.add(fingerprint.digest(record["network"]))
+        self.file = open(fname, "a")
+        self.flush_every = flush_every
+        self.sync_interval = sync_interval
+        self.unflushed = 0
+        self.last_sync = time.time()
+
+    def __call__(self, netspec, **info):
+        if self.written.add(fingerprint.digest(netspec)):
+            self.write(netspec, **info)
+
+    def write(self, netspec, **info):
+        record = {"network" : netspec}
+        record.update(info)
+        self.file.write(json.dumps(record) + "\n")
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every or time.time() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        self.unflushed = 0
+        if time.time() - self.last_sync >= self.sync_interval:
+            os.fsync(self.file.fileno())
+            self.last_sync = time.time()
+
+    def offset(self):
+        # length of the written records, synced to disk so that a checkpoint can refer to them
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.time()
+        return self.file.tell()
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def read_networks(fname, end=None):
+    '''
+    Read the records written by NetworkWriter without loading the whole file.
+
+    :param fname: path to a networks.jsonl file
+    :param end: optional byte offset, for example from NetworkWriter.offset; only the records before it are read
+    :return: generator of dictionaries with at least the key "network"
+    '''
+    with open(fname, "rb") as f:
+        pos = 0
+        for line in f:
+            pos += len(line)
+            if end is not None and pos > end:
+                break
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # partial record from an interrupted search
+                    continue
+
+
+def write_network_list(fname, networks):
+    # write networks.txt, a Python list of network specifications, one network at a time
+    with open(fname, "w") as f:
+        f.write("[")
+        for k, netspec in enumerate(networks):
+            f.write((", " if k else "") + repr(netspec))
+        f.write("]")
+
+
+def truncate_partial_record(fname):
+    # remove an unfinished last line, so that appended records start on a new line
+    with open(fname, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        pos = end
+        while pos > 0:
+            f.seek(pos - 1)
+            if f.read(1) == b"\n":
+                break
+            pos -= 1
+        if pos < end:
+            f.truncate(pos)
+
+
+#####################################################################################################################
+# Indexed store of accepted networks and their metadata.
+#####################################################################################################################
+
+# sqlite integers are signed 64-bit
+MAXPARAMS = 2**63 - 1
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS seeds (id INTEGER PRIMARY KEY, network TEXT UNIQUE)",
+    "CREATE TABLE IF NOT EXISTS networks (network TEXT PRIMARY KEY, params INTEGER, nodes INTEGER, edges INTEGER, "
+    "seed INTEGER REFERENCES seeds(id), add_nodes INTEGER, add_edges INTEGER, remove_edges INTEGER, remove_nodes INTEGER)",
+    "CREATE INDEX IF NOT EXISTS networks_nodes_params ON networks (nodes, params)",
+    "CREATE INDEX IF NOT EXISTS networks_params ON networks (params)",
+    "CREATE INDEX IF NOT EXISTS networks_edges ON networks (edges)",
+    "CREATE INDEX IF NOT EXISTS networks_seed ON networks (seed)",
+]
+
+COLUMNS = ["network", "params", "nodes", "edges", "seed", "add_nodes", "add_edges", "remove_edges", "remove_nodes"]
+
+
+class ResultsStore():
+    '''
+    Sqlite file of the accepted networks, indexed by number of DSGRN parameters, nodes, edges and seed network, so
+    that networks can be selected without parsing them or making DSGRN objects. Calling the store with a network
+    and the metadata passed to on_accept (see networksearch.perturbNetwork) inserts it unless it is already stored.
+    Inserts are committed every commit_every networks and when the store is closed.
+    '''
+
+    def __init__(self, fname, commit_every=1000):
+        self.fname = fname
+        self.db = sqlite3.connect(fname, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+        self.seeds = dict(self.db.execute("SELECT network, id FROM seeds"))
+        self.commit_every = commit_every
+        self.uncommitted = 0
+
+    def __call__(self, netspec, params=None, nodes=None, edges=None, seed=None, operations=None, **info):
+        operations = operations or [None]*4
+        if params is not None:
+            params = min(params, MAXPARAMS)
+        self.db.execute("INSERT OR IGNORE INTO networks VALUES (?,?,?,?,?,?,?,?,?)",
+                        [netspec, params, nodes, edges, self.seed_id(seed)] + list(operations))
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def seed_id(self, seed):
+        # seed network specifications are stored once
+        if seed is None:
+            return None
+        if seed not in self.seeds:
+            self.db.execute("INSERT OR IGNORE INTO seeds (network) VALUES (?)", (seed,))
+            self.seeds[seed] = self.db.execute("SELECT id FROM seeds WHERE network = ?", (seed,)).fetchone()[0]
+        return self.seeds[seed]
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+def query_networks(fname, min_params=None, max_params=None, nodes=None, edges=None, seed=None):
+    '''
+    Select networks from a file written by ResultsStore using its indexes, for example
+    query_networks(fname, max_params=50000, nodes=6).
+
+    :param fname: path to a networks.db file
+    :param min_params: smallest number of DSGRN parameters
+    :param max_params: largest number of DSGRN parameters
+    :param nodes: number of nodes
+    :param edges: number of edges
+    :param seed: seed network specification
+    :return: generator of dictionaries with the keys "network", "params", "nodes", "edges", "seed", "add_nodes",
+             "add_edges", "remove_edges" and "remove_nodes"
+    '''
+    conditions = []
+    args = []
+    for condition, value in [("networks.params >= ?", min_params), ("networks.params <= ?", max_params),
+                             ("networks.nodes = ?", nodes), ("networks.edges = ?", edges), ("seeds.network = ?", seed)]:
+        if value is not None:
+            conditions.append(condition)
+            args.append(value)
+    sql = "SELECT networks.network, params, nodes, edges, seeds.network, add_nodes, add_edges, remove_edges, " \
+          "remove_nodes FROM networks LEFT JOIN seeds ON networks.seed = seeds.id"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    db = sqlite3.connect(fname, timeout=60)
+    try:
+        for row in db.execute(sql, args):
+            yield dict(zip(COLUMNS, row))
+    finally:
+        db.close()
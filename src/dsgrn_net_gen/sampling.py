@@ -0,0 +1,51 @@
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#####################################################################################################################
+# Batched drawing of the numbers of operations that perturb a graph.
+#####################################################################################################################
+
+class OperationSampler():
+    '''
+    Draws the numbers of nodes and edges to add and remove for batchsize perturbed graphs at a time with a NumPy
+    Generator, instead of one uniform number per operation as in networksearch.choose_operations. The number of
+    operations is uniform in range_operations and is split among addNode, addEdge, removeEdge and removeNode by a
+    multinomial draw with the operation probabilities, which is the distribution of choose_operations. Each batch
+    uses a Generator seeded with 64 bits from the random module, so the draws are determined by random.seed and
+    random.setstate; call reset() after random.setstate to drop the rest of the current batch.
+    '''
+
+    def __init__(self, range_operations, probabilities, batchsize=100):
+        if numpy is None:
+            raise ValueError("\nThe numpy sampler needs NumPy. Install numpy or use \"sampler\" : \"python\".\n")
+        # range_operations is end-point exclusive and probabilities is cumulative, as made by networksearch.setup
+        self.low, self.high = range_operations
+        pvals = numpy.diff([0.0] + list(probabilities))
+        self.pvals = numpy.clip(pvals, 0.0, 1.0)
+        self.batchsize = max(int(batchsize), 1)
+        self.batch = []
+
+    def __call__(self):
+        # [addNode, addEdge, removeEdge, removeNode] counts for the next perturbed graph
+        if not self.batch:
+            rng = numpy.random.default_rng(random.getrandbits(64))
+            numadds = rng.integers(self.low, self.high, size=self.batchsize)
+            # reversed, so that pop() returns the rows in order
+            self.batch = rng.multinomial(numadds, self.pvals).tolist()[::-1]
+        return self.batch.pop()
+
+    def reset(self):
+        self.batch = []
+
+
+def make_sampler(params):
+    # None for the default sampling in networksearch.choose_operations
+    if params["sampler"] == "python":
+        return None
+    if params["sampler"] == "numpy":
+        return OperationSampler(params["range_operations"], params["probabilities"], params["chunksize"])
+    raise ValueError("\nUnknown sampler {}. Choose \"python\" or \"numpy\".\n".format(params["sampler"]))
@@ -0,0 +1,185 @@
+import random, time, multiprocessing
+import dsgrn_utilities.graphtranslation as graphtranslation
+import dsgrn_net_gen.networksearch as networksearch
+import dsgrn_net_gen.parallel as parallel
+import dsgrn_net_gen.workgraph as workgraph
+import dsgrn_net_gen.checkpoint as checkpoint
+import dsgrn_net_gen.dedup as dedup
+from copy import deepcopy
+
+#####################################################################################################################
+# Concurrent search around several seed networks under one budget.
+#####################################################################################################################
+
+# a seed whose neighborhood is exhausted still gets this fraction of the perturbations of the most productive seed
+MIN_SHARE = 0.05
+# weight of the latest slice in the yield of a seed
+DECAY = 0.5
+
+
+class Seed():
+    # scheduling state of one seed network
+    __slots__ = ("index", "state", "rate", "stride", "perturbed", "accepted")
+
+    def __init__(self, index, state):
+        self.index = index
+        self.state = state       # pseudo-random state for the next slice
+        self.rate = 1.0          # recent fraction of perturbations that gave a new network, optimistic at the start
+        self.stride = 0.0        # seeds with the smallest stride are perturbed next
+        self.perturbed = 0
+        self.accepted = 0
+
+    def update(self, new, n, state):
+        self.state = state
+        self.perturbed += n
+        self.accepted += new
+        if n:
+            self.rate = DECAY*self.rate + (1 - DECAY)*new/n
+
+    def to_json(self):
+        return {"state" : checkpoint.random_state_to_json(self.state), "rate" : self.rate, "stride" : self.stride,
+                "perturbed" : self.perturbed, "accepted" : self.accepted}
+
+    @classmethod
+    def from_json(cls, index, saved):
+        self = cls(index, checkpoint.json_to_random_state(saved["state"]))
+        self.rate, self.stride = saved["rate"], saved["stride"]
+        self.perturbed, self.accepted = saved["perturbed"], saved["accepted"]
+        return self
+
+
+def perturbSeeds(params_init, network_specs, on_accept=None, save_state=None, resume=None, stats=None):
+    '''
+    Perturb several seed networks concurrently under one budget: "numneighbors" and "time_to_wait" are totals for all
+    of the seeds together. The accepted networks, the verdict memo and the DSGRN parameter graph cache are shared by
+    the seeds, so a network found from two seeds is checked and counted once. Seeds are perturbed params["chunksize"]
+    networks at a time, in rounds of up to params["workers"] seeds that run in parallel. Each seed is scheduled in
+    proportion to its yield, the recent fraction of its perturbations that gave a new network, so that seeds whose
+    neighborhoods are exhausted or mostly rejected get fewer perturbations, but at least MIN_SHARE of those of the most
+    productive seed. Each seed has its own pseudo-random stream and the rounds are merged in order, so the search is
+    reproducible for fixed "random_seed" and "workers". Only the "sample" mode is supported.
+
+    :param params_init: dictionary of parameters, see networksearch.perturbNetwork
+    :param network_specs: list of DSGRN network specification strings
+    :param on_accept: optional function called with each network specification and its metadata when it is accepted,
+                      see networksearch.perturbNetwork
+    :param save_state: optional function called with a JSON-serializable dictionary of the state of the search every
+                       params["checkpoint_interval"] seconds
+    :param resume: optional dictionary saved by save_state; the search continues from that state
+    :param stats: optional dictionary that is filled with statistics of the search, see networksearch.perturbNetwork
+    :return: list of essential DSGRN network specification strings, or with "spill_networks" a dedup.NetworkSet of
+             them, whose file is deleted when it is closed or, without save_state, garbage collected
+    '''
+    params, _ = networksearch.setup(deepcopy(params_init), network_specs[0])
+    if params["mode"] != "sample":
+        raise ValueError("\nMode {} is not supported with concurrent seeds. Use \"sample\" or search the seeds one at a time.\n".format(params["mode"]))
+    params["on_accept"] = on_accept
+    if resume:
+        networks = networksearch.restore_state(params, resume, keep=bool(save_state))
+        seeds = [Seed.from_json(k, saved) for k, saved in enumerate(resume["seeds"])]
+        start_time = time.time() - resume["elapsed"]
+        count = resume["count"]
+    else:
+        networks = dedup.make_network_set(params, keep=bool(save_state))
+        for network_spec in network_specs:
+            starting_graph = starting_network(network_spec)
+            starting_netspec = graphtranslation.createEssentialNetworkSpecFromGraph(starting_graph)
+            if networksearch.enforce_filters(starting_graph, starting_netspec, params):
+                info = networksearch.network_info(starting_graph, starting_netspec, params, [0, 0, 0, 0])
+                info["seed"] = network_spec
+                networksearch.add_network(networks, starting_netspec, params, info)
+        seeds = [Seed(k, parallel.stream_state(params["random_seed"], k)) for k in range(len(network_specs))]
+        start_time = time.time()
+        count = 0
+    deadline = start_time + params["time_to_wait"]
+
+    workers = params["workers"]
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(params_init, network_specs))
+    else:
+        init_worker(params_init, network_specs)
+    last_save = time.time()
+    try:
+        while (len(networks) < params['numneighbors']) and (time.time() < deadline):
+            chosen = schedule(seeds, workers)
+            args = [(seed.index, seed.state, deadline) for seed in chosen]
+            if pool:
+                results = pool.starmap(perturb_slice, args)
+            else:
+                results = [perturb_slice(*a) for a in args]
+            for seed, (accepted, msg_dict, slice_stats, n, state) in zip(chosen, results):
+                count += n
+                seed.update(parallel.merge_chunk(params, networks, accepted, msg_dict, slice_stats, count), n, state)
+            params["timeline"].sample(time.time() - start_time, count, len(networks))
+            if params["compressed_output"]:
+                networksearch.update_line(params["msg_dict"], len(networks))
+            if save_state and checkpoint.due(params, last_save):
+                state = networksearch.search_state(params, networks, start_time, count)
+                state["seeds"] = [seed.to_json() for seed in seeds]
+                save_state(state)
+                last_save = time.time()
+            if params["stopping"]:
+                params["stop_reason"] = params["stopping"].check(count)
+                if params["stop_reason"]:
+                    break
+    finally:
+        if pool:
+            # the rounds are synchronous, so no slice is still running
+            parallel.shutdown(pool, None, 0)
+        else:
+            _worker.clear()
+
+    params["param_cache"].flush()
+    if params["evaluator"]:
+        params["evaluator"].close()
+    if params["compressed_output"]:
+        networksearch.update_line(params["msg_dict"], len(networks))
+    networksearch.report_stop(params, networks, start_time)
+    print("\nSaving {} networks.".format(len(networks)))
+    if stats is not None:
+        stats.update(networksearch.search_statistics(params, networks, start_time, count))
+        stats["seeds"] = [{"perturbed" : seed.perturbed, "accepted" : seed.accepted, "rate" : seed.rate}
+                          for seed in seeds]
+    return dedup.search_result(networks)
+
+
+def starting_network(network_spec):
+    if not network_spec or network_spec == "\n":
+        return graphtranslation.Graph()
+    starting_graph = graphtranslation.getGraphFromNetworkSpec(network_spec)
+    networksearch.sanity_check_edges(network_spec, starting_graph)
+    return starting_graph
+
+
+def schedule(seeds, workers):
+    # stride scheduling: the seeds that are furthest behind their share run next, at most one slice per seed per round
+    top = max(seed.rate for seed in seeds)
+    chosen = sorted(seeds, key=lambda seed: (seed.stride, seed.index))[:workers]
+    for seed in chosen:
+        share = max(seed.rate / top, MIN_SHARE) if top > 0 else 1.0
+        seed.stride += 1.0 / share
+    return chosen
+
+
+##########################################################################################
+# Slices of the search around one seed, run in the worker processes or in this process
+##########################################################################################
+
+_worker = {}
+
+def init_worker(params_init, network_specs):
+    # initialized parameters and working graph of every seed; the seeds share the verdict memo and the filter chain
+    _worker["seeds"] = []
+    for network_spec in network_specs:
+        params, starting_graph = networksearch.setup(deepcopy(params_init), network_spec)
+        if _worker["seeds"]:
+            params["verdicts"] = _worker["seeds"][0][0]["verdicts"]
+            params["filter_chain"] = _worker["seeds"][0][0]["filter_chain"]
+        _worker["seeds"].append((params, workgraph.WorkGraph.from_graph(starting_graph)))
+
+
+def perturb_slice(index, state, deadline):
+    params, working_graph = _worker["seeds"][index]
+    accepted, msg_dict, stats, count = parallel.perturb_networks(params, working_graph, state, deadline)
+    return accepted, msg_dict, stats, count, random.getstate()
@@ -0,0 +1,110 @@
+import concurrent.futures, contextlib, json, multiprocessing, os, socket, socketserver, sys, threading
+from dsgrn_net_gen.makejobs import Job
+
+#####################################################################################################################
+# Long-lived server that runs jobs sent over a Unix socket in warm worker processes.
+#####################################################################################################################
+
+# also in submit_job.py, which does not import this package
+DEFAULT_SOCKET = os.path.expanduser("~/.dsgrn_net_gen.sock")
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''
+    Accepts one JSON request per connection on a Unix socket and answers with one JSON line when the job is done.
+    A request is {"paramfile" : path, "cwd" : directory} to run makejobs.Job(path), {"resume" : resultsdir,
+    "cwd" : directory} to run makejobs.Job.resume(resultsdir), or {"shutdown" : true} to stop the server after the
+    running jobs. Relative paths in the request and the parameter file are relative to cwd. The answer is
+    {"resultsdir" : path, "networks" : path to networks.txt} or {"error" : message}.
+
+    Up to `workers` jobs run at once, each in one of a fixed set of worker processes. The worker processes are
+    forked from a server process that has already imported DSGRN and this package, and they stay alive between jobs,
+    so that later jobs skip the start-up and keep the in-memory caches of earlier ones (the DSGRN parameter graph
+    sizes of paramcache.py and the per-node factors of paramcount.py). A worker process may still run a search with
+    "workers" > 1 in processes of its own. Each job writes its printed output to job.log in its results directory.
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, socketpath=DEFAULT_SOCKET, workers=None):
+        remove_stale_socket(socketpath)
+        super().__init__(socketpath, JobHandler)
+        self.socketpath = socketpath
+        self.executor = make_executor(workers or os.cpu_count())
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        if os.path.exists(self.socketpath):
+            os.remove(self.socketpath)
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        if request.get("shutdown"):
+            reply = {"status" : "shutting down"}
+            # shutdown() waits for serve_forever() to return, so it must not run in the thread that serves it
+            threading.Thread(target=self.server.shutdown).start()
+        else:
+            try:
+                reply = self.server.executor.submit(run_job, request).result()
+            except Exception as e:
+                reply = {"error" : "{}: {}".format(type(e).__name__, e)}
+        self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+def make_executor(workers):
+    # worker processes forked from a forkserver that has imported this package; ProcessPoolExecutor takes no
+    # mp_context before Python 3.7, so there the workers are forked from this process, which has imported it too,
+    # before the server starts any threads
+    if sys.version_info < (3, 7):
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+        # the first task starts all of the worker processes
+        executor.submit(int).result()
+        return executor
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["dsgrn_net_gen"])
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=context)
+
+
+def run_job(request):
+    # run one job in a worker process
+    os.chdir(request["cwd"])
+    if "resume" in request:
+        job = Job.resume(request["resume"])
+    else:
+        job = Job(request["paramfile"])
+    with open(os.path.join(job.resultsdir, "job.log"), "a") as log, contextlib.redirect_stdout(log):
+        job.run()
+    return {"resultsdir" : os.path.abspath(job.resultsdir),
+            "networks" : os.path.abspath(os.path.join(job.perturbationsdir, "networks.txt"))}
+
+
+def remove_stale_socket(socketpath):
+    # a socket file left by a server that is no longer running; a running server is left alone
+    if not os.path.exists(socketpath):
+        return
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socketpath)
+    except OSError:
+        os.remove(socketpath)
+    else:
+        raise ValueError("\nA server is already listening on {}.\n".format(socketpath))
+    finally:
+        s.close()
+
+
+def serve(socketpath=DEFAULT_SOCKET, workers=None):
+    '''
+    Run jobs sent by submit_job.py until a shutdown request arrives.
+
+    :param socketpath: path of the Unix socket
+    :param workers: number of jobs that run at once, default = number of CPUs
+    :return: None
+    '''
+    with JobServer(socketpath, workers) as server:
+        print("Serving dsgrn_net_gen jobs on {}".format(socketpath), flush=True)
+        server.serve_forever()
@@ -0,0 +1,157 @@
+import ast, glob, hashlib, itertools, json, math, os, time
+import dsgrn_utilities.graphtranslation as graphtranslation
+import dsgrn_net_gen.fileparsers as fileparsers
+import dsgrn_net_gen.dedup as dedup
+import dsgrn_net_gen.fingerprint as fingerprint
+import dsgrn_net_gen.results as results
+
+#####################################################################################################################
+# Splitting a job into shards that run independently, and merging their results.
+#####################################################################################################################
+
+# parameters holding paths, made absolute so that shards can be run from any directory
+PATHS = ["edgefile", "nodefile", "param_cache", "parse_cache"]
+
+
+def make_shards(paramfile, nshards, shardsdir):
+    '''
+    Split a job into nshards jobs that can run on different machines. Shard k is written to shardsdir/shard<k>, which
+    holds its parameter file params.json, its seed networks seeds.jsonl, and later its results. Each shard has its
+    own "random_seed" derived from the "random_seed" of the job, so that the shards search independent pseudo-random
+    streams. If there are at least as many seeds as shards, the seeds are dealt to the shards in turn and each seed
+    keeps its "numneighbors"; with "concurrent_seeds", the total "numneighbors" is divided among the shards in
+    proportion to their seeds. If there are fewer seeds than shards, each shard searches one seed and the shards of a
+    seed divide its "numneighbors". Run each shard with call_job.py and combine them with merge_shards.
+
+    :param paramfile: path to the parameter file of the job, see makejobs.Job
+    :param nshards: number of shards
+    :param shardsdir: directory for the shards
+    :return: list of the paths of the parameter files of the shards
+    '''
+    params = json.load(open(paramfile))
+    if "random_seed" not in params:
+        params["random_seed"] = time.time()
+    for key in PATHS:
+        if key in params and params[key] and params[key].strip():
+            params[key] = os.path.abspath(os.path.expanduser(params[key]))
+    dirs = [os.path.abspath(os.path.join(shardsdir, "shard{}".format(k))) for k in range(nshards)]
+    for d in dirs:
+        os.makedirs(d)
+    seedfiles = [open(os.path.join(d, "seeds.jsonl"), "w") for d in dirs]
+    numseeds = [0]*nshards
+    try:
+        seeds = fileparsers.iterNetworkFile(params["networkfile"])
+        first = [seed for _, seed in zip(range(nshards), seeds)]
+        if len(first) < nshards:
+            # every shard searches one seed
+            for k in range(nshards):
+                seedfiles[k].write(json.dumps(first[k % len(first)]) + "\n")
+                numseeds[k] = 1
+        else:
+            for j, seed in enumerate(itertools.chain(first, seeds)):
+                seedfiles[j % nshards].write(json.dumps(seed) + "\n")
+                numseeds[j % nshards] += 1
+    finally:
+        for f in seedfiles:
+            f.close()
+
+    paramfiles = []
+    total = sum(numseeds)
+    for k, d in enumerate(dirs):
+        shard = dict(params)
+        shard["networkfile"] = os.path.join(d, "seeds.jsonl")
+        shard["resultsdir"] = d
+        shard["random_seed"] = shard_seed(params["random_seed"], k)
+        if "numneighbors" in params:
+            if len(first) < nshards:
+                sharing = len(range(k % len(first), nshards, len(first)))
+                shard["numneighbors"] = math.ceil(params["numneighbors"] / sharing)
+            elif "concurrent_seeds" in params and params["concurrent_seeds"]:
+                shard["numneighbors"] = math.ceil(params["numneighbors"] * numseeds[k] / total)
+        paramfiles.append(os.path.join(d, "params.json"))
+        with open(paramfiles[-1], "w") as f:
+            json.dump(shard, f, indent=1)
+    return paramfiles
+
+
+def shard_seed(random_seed, shard):
+    # independent reproducible "random_seed" of each shard
+    return int(hashlib.sha1("{}:shard{}".format(random_seed, shard).encode()).hexdigest()[:15], 16)
+
+
+def shard_results(shardsdir):
+    # networks folders of the finished shards, in shard order
+    dirs = glob.glob(os.path.join(shardsdir, "shard*", "dsgrn_net_gen_results*", "networks*"))
+    return sorted(dirs, key=lambda d: int(d.split(os.sep)[-3][len("shard"):]))
+
+
+def read_shard(networksdir):
+    # the network records of one shard, streamed from networks.jsonl if it was written
+    jsonl = os.path.join(networksdir, "networks.jsonl")
+    if os.path.exists(jsonl):
+        yield from results.read_networks(jsonl)
+    else:
+        for netspec in ast.literal_eval(open(os.path.join(networksdir, "networks.txt")).read()):
+            yield {"network" : netspec}
+
+
+def merge_shards(shardsdir, outdir=None, collapse_isomorphic=False):
+    '''
+    Combine the results of the shards made by make_shards. The networks of the shards are streamed in shard order and
+    each network is kept once, using only the fingerprints of the kept networks; with collapse_isomorphic, a network
+    isomorphic to one already kept is dropped as well. The combined networks are written to outdir/networks.jsonl,
+    one record per line with the shard of the network, and to outdir/networks.txt; the summed counts of perturbed and
+    accepted networks and of each warning are written to outdir/stats.json.
+
+    :param shardsdir: directory of the shards
+    :param outdir: directory for the combined results, default = shardsdir/merged
+    :param collapse_isomorphic: (True or False) also drop networks isomorphic to a kept network
+    :return: dictionary of the combined statistics
+    '''
+    outdir = outdir or os.path.join(shardsdir, "merged")
+    os.makedirs(outdir, exist_ok=True)
+    seen = dedup.FingerprintSet()
+    duplicates = 0
+    stats = {"shards" : [], "perturbed" : 0, "accepted" : 0, "warnings" : {}}
+    jsonl = os.path.join(outdir, "networks.jsonl")
+    if os.path.exists(jsonl):
+        # merge again from scratch
+        os.remove(jsonl)
+    writer = results.NetworkWriter(jsonl)
+    try:
+        for k, networksdir in enumerate(shard_results(shardsdir)):
+            stats["shards"].append(networksdir)
+            for record in read_shard(networksdir):
+                netspec = record.pop("network")
+                if collapse_isomorphic:
+                    key = fingerprint.canonical_fingerprint(graphtranslation.getGraphFromNetworkSpec(netspec))
+                else:
+                    key = fingerprint.digest(netspec)
+                if not seen.add(key):
+                    duplicates += 1
+                    continue
+                record["shard"] = k
+                writer.write(netspec, **record)
+            add_shard_statistics(stats, networksdir)
+    finally:
+        writer.close()
+    netspecs = (record["network"] for record in results.read_networks(jsonl))
+    results.write_network_list(os.path.join(outdir, "networks.txt"), netspecs)
+    stats["networks"] = len(seen)
+    stats["duplicates"] = duplicates
+    with open(os.path.join(outdir, "stats.json"), "w") as f:
+        json.dump(stats, f, indent=1)
+    return stats
+
+
+def add_shard_statistics(stats, networksdir):
+    # sum the counts in the stats.json of a shard, written with or without "concurrent_seeds"
+    fname = os.path.join(networksdir, "stats.json")
+    if not os.path.exists(fname):
+        return
+    saved = json.load(open(fname))
+    for seed in [saved] if "warnings" in saved else saved["seeds"]:
+        stats["perturbed"] += seed["perturbed"]
+        stats["accepted"] += seed["accepted"]
+        for msg, num in seed["warnings"].items():
+            stats["warnings"][msg] = stats["warnings"].get(msg, 0) + num
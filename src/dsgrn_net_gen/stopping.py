@@ -0,0 +1,94 @@
+import dsgrn_net_gen.fingerprint as fingerprint
+
+#####################################################################################################################
+# Early termination of a search whose neighborhood is saturated.
+#####################################################################################################################
+
+class StoppingRule():
+    '''
+    Decides when further perturbations are unlikely to find new networks, from how often each accepted network has
+    been found. The search stops when either
+
+    * no new network was accepted in the last `window` perturbations, or
+    * the Good-Turing estimate of the probability that the next perturbation gives a new accepted network, the
+      number of networks found exactly once divided by the number of perturbations, is below `min_rate`,
+
+    but not before `min_perturbed` perturbations. The Chao1 estimate of the number of networks that can be accepted
+    in the neighborhood is reported with the reason for stopping.
+    '''
+
+    def __init__(self, window=10000, min_rate=1e-4, min_perturbed=1000):
+        self.window = window
+        self.min_rate = min_rate
+        self.min_perturbed = min_perturbed
+        self.found = {}      # fingerprint of an accepted network -> number of times it was found
+        self.singletons = 0  # networks found exactly once
+        self.doubletons = 0  # networks found exactly twice
+        self.last_new = 0    # number of perturbations when the last new network was accepted
+
+    def accept(self, netspec, new, perturbed):
+        # record an accepted network, new if it was added to the networks of the search
+        key = fingerprint.digest(netspec)
+        n = self.found.get(key, 0) + 1
+        self.found[key] = n
+        if n == 1:
+            self.singletons += 1
+        elif n == 2:
+            self.singletons -= 1
+            self.doubletons += 1
+        elif n == 3:
+            self.doubletons -= 1
+        if new:
+            self.last_new = perturbed
+
+    def new_rate(self, perturbed):
+        # Good-Turing estimate of the probability that a perturbation gives a network not found before
+        return self.singletons / perturbed if perturbed else 1.0
+
+    def estimated_size(self):
+        # Chao1 estimate of the number of networks in the neighborhood that pass the filters
+        f1, f2 = self.singletons, self.doubletons
+        if f2:
+            return len(self.found) + f1 * f1 / (2 * f2)
+        return len(self.found) + f1 * (f1 - 1) / 2
+
+    def check(self, perturbed):
+        '''
+        :param perturbed: number of perturbations so far
+        :return: reason to stop the search, or "" to continue
+        '''
+        if perturbed < self.min_perturbed:
+            return ""
+        if perturbed - self.last_new >= self.window:
+            reason = "No new networks in the last {} perturbations".format(perturbed - self.last_new)
+        elif self.new_rate(perturbed) < self.min_rate:
+            reason = "Estimated probability of a new network per perturbation {:.2g} is below {:.2g}".format(
+                self.new_rate(perturbed), self.min_rate)
+        else:
+            return ""
+        return reason + " (estimated neighborhood size {:.0f}, found {})".format(self.estimated_size(), len(self.found))
+
+    def to_json(self):
+        # JSON-serializable counts for checkpoints; the numbers of singletons and doubletons follow from them
+        return {"found" : [[key, n] for key, n in self.found.items()], "last_new" : self.last_new}
+
+    @classmethod
+    def from_json(cls, saved, window=10000, min_rate=1e-4, min_perturbed=1000):
+        self = cls(window, min_rate, min_perturbed)
+        self.found = {key : n for key, n in saved["found"]}
+        self.singletons = sum(1 for n in self.found.values() if n == 1)
+        self.doubletons = sum(1 for n in self.found.values() if n == 2)
+        self.last_new = saved["last_new"]
+        return self
+
+
+def make_rule(early_stop):
+    # early_stop is False, True for the default rule, or a dictionary of keyword arguments of StoppingRule
+    if not early_stop:
+        return None
+    if early_stop is True:
+        return StoppingRule()
+    unknown = set(early_stop).difference(["window", "min_rate", "min_perturbed"])
+    if unknown:
+        raise ValueError("\nUnknown early_stop keys {}. Use window, min_rate and min_perturbed.\n".format(unknown))
+    return StoppingRule(**early_stop)
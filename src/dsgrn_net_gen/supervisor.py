@@ -0,0 +1,107 @@
+import json, os, select, subprocess, sys, time
+
+#####################################################################################################################
+# DSGRN evaluation in a child process that is killed when it takes too long or uses too much memory.
+#####################################################################################################################
+
+# seconds between checks of the memory of the child process
+POLL_INTERVAL = 0.05
+
+
+class SupervisedEvaluator():
+    '''
+    Computes (computable, number of DSGRN parameters) of network specifications in a child process, one at a time.
+    If an evaluation takes more than timeout seconds, or the resident memory of the child process exceeds max_rss
+    megabytes, the child is killed and the evaluation returns None; a new child is started for the next evaluation.
+    The child is a separate Python process started with subprocess, so that evaluators can also be used in the worker
+    processes of a multiprocessing pool. Memory is read from /proc, so max_rss is only enforced on Linux.
+    '''
+
+    def __init__(self, timeout=None, max_rss=None):
+        self.timeout = timeout
+        self.max_rss = max_rss * 2**20 if max_rss else None
+        self.process = None
+        self.pid = None
+        self.restarts = 0
+
+    def __call__(self, network_spec):
+        if self.process is None or self.pid != os.getpid() or self.process.poll() is not None:
+            self.start()
+        self.process.stdin.write(json.dumps(network_spec) + "\n")
+        self.process.stdin.flush()
+        deadline = time.time() + self.timeout if self.timeout else None
+        while True:
+            wait = POLL_INTERVAL if self.max_rss else None
+            if deadline is not None:
+                remaining = max(deadline - time.time(), 0.0)
+                wait = remaining if wait is None else min(wait, remaining)
+            ready, _, _ = select.select([self.process.stdout], [], [], wait)
+            if self.max_rss and rss(self.process.pid) > self.max_rss:
+                break
+            if ready:
+                line = self.process.stdout.readline()
+                if not line:
+                    # the child died, for example when it ran out of memory
+                    break
+                computable, size = json.loads(line)
+                return computable, size
+            if deadline is not None and time.time() >= deadline:
+                break
+        self.kill()
+        self.restarts += 1
+        return None
+
+    def start(self):
+        # the child imports this package the same way as this process
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        command = [sys.executable, "-c", "import dsgrn_net_gen.supervisor as s; s.serve()"]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True,
+                                        env=env)
+        self.pid = os.getpid()
+        # wait until DSGRN is imported, so that the start-up time is not counted against the first evaluation
+        if self.process.stdout.readline().strip() != "ready":
+            raise RuntimeError("The DSGRN evaluation process did not start.")
+
+    def kill(self):
+        self.process.kill()
+        self.close()
+
+    def close(self):
+        # stop the child; a child inherited by a forked process belongs to the parent
+        if self.process is not None and self.pid == os.getpid():
+            for pipe in [self.process.stdin, self.process.stdout]:
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+
+def rss(pid):
+    # resident memory of a process in bytes, or 0 if it is not known
+    try:
+        with open("/proc/{}/statm".format(pid)) as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def make_evaluator(params):
+    # None for evaluation in this process
+    if not params["eval_timeout"] and not params["eval_max_rss"]:
+        return None
+    return SupervisedEvaluator(params["eval_timeout"], params["eval_max_rss"])
+
+
+def serve():
+    # child process: read one JSON network specification per line and answer [computable, size]
+    import dsgrn_net_gen.networksearch as networksearch
+    print("ready", flush=True)
+    for line in sys.stdin:
+        computable, size = networksearch.paramgraph_size(json.loads(line))
+        print(json.dumps([computable, size]), flush=True)
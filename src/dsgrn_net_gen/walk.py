@@ -0,0 +1,73 @@
+import random, time
+from collections import deque
+# networksearch imports this module; a from-import also works while networksearch is partly initialized
+from dsgrn_net_gen import networksearch
+
+#####################################################################################################################
+# Random walk through the accepted networks around the seed network.
+#####################################################################################################################
+
+def walk_networks(starting_graph, params, networks, start_time):
+    '''
+    Perturb recently accepted networks instead of the seed network. The walk keeps the params["walk_pool_size"] most
+    recently accepted new networks, starting with the seed, and each candidate is a perturbation of a uniformly random
+    member of the pool by params["range_operations"] operations. A candidate that passes the checks and is not yet
+    in networks joins the pool. As in a Metropolis walk whose target is uniform on the networks that pass the checks,
+    a proposal that passes is always taken and one that fails is never taken. Since every step starts from a
+    network that passed, small range_operations keep the acceptance rate high while the walk moves away from the
+    seed. Candidates whose distance from the seed, the number of nodes and signed edges in which they differ from it,
+    is more than params["walk_max_distance"] are rejected with the warning "Too far from seed" before any other check.
+    The walk stops when params["numneighbors"] networks are accepted, params["time_to_wait"] seconds have passed, or
+    params["early_stop"] ends it.
+
+    :param starting_graph: WorkGraph of the seed network
+    :param params: parameters initialized by networksearch.setup
+    :param networks: set of accepted network specifications, updated in place
+    :param start_time: time.time() at the start of the search
+    :return: the number of perturbed graphs
+    '''
+    seed = labelled(starting_graph)
+    pool = deque([starting_graph], maxlen=params["walk_pool_size"])
+    maxdistance = params["walk_max_distance"]
+    stop = params["stopping"]
+    count = 0
+    while (len(networks) < params['numneighbors']) and (time.time() - start_time < params['time_to_wait']):
+        count += 1
+        start = time.perf_counter()
+        numops = networksearch.choose_operations(params)
+        graph = networksearch.perform_operations(random.choice(pool).clone(), params, numops)
+        params["timers"].add("perform_operations", start)
+        if not graph:
+            params["msg_dict"]["Aborted"] += 1
+        elif maxdistance is not None and distance(seed, labelled(graph)) > maxdistance:
+            networksearch.warn("Too far from seed", graph, None, params)
+        else:
+            netspec = networksearch.check_perturbed(graph, params, numops)
+            if netspec:
+                # the operations of the last step do not describe how the network was made from the seed
+                params["accepted_info"]["operations"] = None
+                new = networksearch.add_network(networks, netspec, params, params["accepted_info"])
+                if new:
+                    pool.append(graph)
+                if stop:
+                    stop.accept(netspec, new, count)
+        if stop and not count % 100:
+            params["stop_reason"] = stop.check(count)
+            if params["stop_reason"]:
+                break
+        if not count % 1000 and params["compressed_output"]:
+            networksearch.update_line(params["msg_dict"], len(networks))
+        params["timeline"].sample(time.time() - start_time, count, len(networks))
+    return count
+
+
+def labelled(graph):
+    # node labels and signed edges between labels
+    nodes = set(graph.vertex_label(v) for v in graph.vertices())
+    edges = set((graph.vertex_label(u), graph.vertex_label(v), graph.edge_label(u, v)) for (u, v) in graph.edges())
+    return nodes, edges
+
+
+def distance(first, second):
+    # number of nodes and signed edges in only one of two labelled graphs
+    return len(first[0] ^ second[0]) + len(first[1] ^ second[1])
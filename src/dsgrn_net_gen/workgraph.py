@@ -0,0 +1,146 @@
+import dsgrn_utilities.graphtranslation as graphtranslation
+
+#####################################################################################################################
+# Compact graph used while perturbing networks.
+#####################################################################################################################
+
+class WorkGraph():
+    '''
+    Graph with the same methods as dsgrn_utilities.graphtranslation.Graph that is used in the perturbation loop.
+    Vertices are the integers 0,...,n-1 and are renumbered when a vertex is removed, as in graphtranslation.
+    Adjacencies are stored as integer bitsets, so that edge membership and degrees do not scan the edges, and clones
+    share their lists with the original until one of them is changed.
+    '''
+    __slots__ = ("labels", "out", "inn", "rep", "ids", "shared")
+
+    def __init__(self):
+        self.labels = []   # vertex labels
+        self.out = []      # bit w of out[v] is set if there is an edge v -> w
+        self.inn = []      # bit v of inn[w] is set if there is an edge v -> w
+        self.rep = []      # bit w of rep[v] is set if the edge v -> w is repressing
+        self.ids = None    # label -> vertex, made when needed
+        self.shared = False
+
+    @classmethod
+    def from_graph(cls, graph):
+        # vertices are renumbered in increasing order
+        self = cls()
+        vertices = sorted(graph.vertices())
+        index = {v: k for k, v in enumerate(vertices)}
+        for v in vertices:
+            self.add_vertex(index[v], label=graph.vertex_label(v))
+        for (u, v) in graph.edges():
+            self.add_edge(index[u], index[v], graph.edge_label(u, v))
+        return self
+
+    def to_graph(self):
+        graph = graphtranslation.Graph()
+        for v, label in enumerate(self.labels):
+            graph.add_vertex(v, label=label)
+        for (u, v) in self.edges():
+            graph.add_edge(u, v, self.edge_label(u, v))
+        return graph
+
+    def clone(self):
+        other = WorkGraph()
+        other.labels, other.out, other.inn, other.rep = self.labels, self.out, self.inn, self.rep
+        other.ids = self.ids
+        other.shared = self.shared = True
+        return other
+
+    def _write(self):
+        # copy on write
+        if self.shared:
+            self.labels, self.out, self.inn, self.rep = self.labels[:], self.out[:], self.inn[:], self.rep[:]
+            self.shared = False
+
+    # graphtranslation.Graph methods
+
+    def vertices(self):
+        return range(len(self.labels))
+
+    def edges(self):
+        return [(u, v) for u in range(len(self.out)) for v in bits(self.out[u])]
+
+    def adjacencies(self, v):
+        return list(bits(self.out[v]))
+
+    def inedges(self, v):
+        return list(bits(self.inn[v]))
+
+    def vertex_label(self, v):
+        return self.labels[v]
+
+    def edge_label(self, u, v):
+        return "r" if self.rep[u] >> v & 1 else "a"
+
+    def get_vertex_from_label(self, label):
+        if self.ids is None:
+            self.ids = {l: v for v, l in enumerate(self.labels)}
+        return self.ids.get(label)
+
+    def add_vertex(self, v, label=''):
+        if v != len(self.labels):
+            raise ValueError("WorkGraph vertices must be added in order.")
+        self._write()
+        self.labels.append(label)
+        self.out.append(0)
+        self.inn.append(0)
+        self.rep.append(0)
+        self.ids = None
+
+    def add_edge(self, u, v, label=''):
+        self._write()
+        self.out[u] |= 1 << v
+        self.inn[v] |= 1 << u
+        if label == "r":
+            self.rep[u] |= 1 << v
+        else:
+            self.rep[u] &= ~(1 << v)
+
+    def remove_edge(self, u, v):
+        self._write()
+        self.out[u] &= ~(1 << v)
+        self.inn[v] &= ~(1 << u)
+        self.rep[u] &= ~(1 << v)
+
+    def remove_vertex(self, v):
+        self._write()
+        for l in (self.labels, self.out, self.inn, self.rep):
+            del l[v]
+        low = (1 << v) - 1
+        for l in (self.out, self.inn, self.rep):
+            for k, b in enumerate(l):
+                l[k] = ((b >> (v + 1)) << v) | (b & low)
+        self.ids = None
+
+    # fast queries
+
+    def has_edge(self, u, v):
+        return bool(self.out[u] >> v & 1)
+
+    def outdegree(self, v):
+        return popcount(self.out[v])
+
+    def indegree(self, v):
+        return popcount(self.inn[v])
+
+    def num_edges(self):
+        return sum(popcount(b) for b in self.out)
+
+
+def bits(b):
+    # indices of the set bits in increasing order
+    while b:
+        low = b & -b
+        yield low.bit_length() - 1
+        b ^= low
+
+
+def popcount(b):
+    return bin(b).count("1")
+
+
+def to_graph(graph):
+    # graphtranslation.Graph for the network spec translation and the user-supplied filters
+    return graph.to_graph() if isinstance(graph, WorkGraph) else graph
@@ -0,0 +1,46 @@
+'''
+Thin client of serve_jobs.py, used instead of call_job.py when a job server is running:
+
+    python submit_job.py <params.json>
+    python submit_job.py --resume <resultsdir>/dsgrn_net_gen_results<datetime>
+    python submit_job.py --shutdown
+
+Only the standard library is imported, so the client starts at once. It waits until the job is done and prints the
+paths of the results directory and of networks.txt.
+'''
+
+import argparse, json, os, socket, sys
+
+# as in dsgrn_net_gen/server.py
+DEFAULT_SOCKET = os.path.expanduser("~/.dsgrn_net_gen.sock")
+
+
+def submit(request, socketpath=DEFAULT_SOCKET):
+    # send one request to the server and return its answer
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socketpath)
+        s.sendall((json.dumps(request) + "\n").encode())
+        with s.makefile() as f:
+            return json.loads(f.readline())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a dsgrn_net_gen job on a running job server.")
+    parser.add_argument("paramfile", nargs="?", help="parameter file of the job")
+    parser.add_argument("--resume", help="results directory of an interrupted job to continue")
+    parser.add_argument("--shutdown", action="store_true", help="stop the server after the running jobs")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path of the Unix socket of the server")
+    args = parser.parse_args()
+    if args.shutdown:
+        request = {"shutdown" : True}
+    elif args.resume:
+        request = {"resume" : args.resume, "cwd" : os.getcwd()}
+    elif args.paramfile:
+        request = {"paramfile" : args.paramfile, "cwd" : os.getcwd()}
+    else:
+        parser.error("give a parameter file, --resume or --shutdown")
+    reply = submit(request, args.socket)
+    if "error" in reply:
+        sys.exit(reply["error"])
+    for key, value in reply.items():
+        print("{} : {}".format(key, value))
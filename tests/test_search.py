@@ -5,7 +5,7 @@ import dsgrn_net_gen.networksearch as ns
 from dsgrn_net_gen.filters import *
 import DSGRN
 from pathlib import Path
-from dsgrn_net_gen.fileparsers import parseEdgeFile, parseNodeFile
+from dsgrn_net_gen.fileparsers import parseEdgeFile, parseNodeFile, iterNetworkFile
 
 shutil.rmtree('temp_results', ignore_errors=True)
 Path("temp_results").mkdir(exist_ok=True)
@@ -198,5 +198,654 @@ def test8():
     assert('X1 : (X1)(~X3) : E\nX2 : (~X1) : E\nX3 : (X1 + X2) : E' in networks)
 
 
+def test9():
+    # a fixed random seed and number of workers gives the same networks
+    params = json.load(open("params_X1X2X3_A.json"))
+    network_spec = open(params["networkfile"]).read()
+    params["edgelist"] = parseEdgeFile(params["edgefile"])
+    params["nodelist"] = parseNodeFile(params["nodefile"])
+    params["workers"] = 2
+    params["chunksize"] = 10
+    params["time_to_wait"] = 30
+    networks1 = ns.perturbNetwork(params,network_spec)
+    networks2 = ns.perturbNetwork(params,network_spec)
+    assert(len(networks1) == 10)
+    assert(set(networks1) == set(networks2))
+    # streams that may not run ahead of the merge give the same networks
+    window = ns.parallel.WINDOW
+    ns.parallel.WINDOW = 0
+    try:
+        assert(set(ns.perturbNetwork(params,network_spec)) == set(networks1))
+    finally:
+        ns.parallel.WINDOW = window
+    conn, sconn, ff, numnodes, numedges, mininedges, maxinedges, minoutedges, maxoutedges,params = check_size(networks1)
+    assert(all([s[0] for s in conn]))
+    assert(all([p <= 100000 for p in params]))
+
+def test10():
+    # parameter graph sizes are stored in and read back from the cache file
+    cachefile = "temp_results/param_cache.sqlite"
+    params = json.load(open("params_X1X2X3_C.json"))
+    network_spec = open(params["networkfile"]).read()
+    params["param_cache"] = cachefile
+    params, starting_graph = ns.setup(params,network_spec)
+    netspec = gt.createEssentialNetworkSpecFromGraph(starting_graph)
+    assert(params["param_cache"].get(netspec) is None)
+    assert(params["filter_chain"](starting_graph,params) == (netspec,""))
+    params["param_cache"].flush()
+    size = DSGRN.ParameterGraph(DSGRN.Network(netspec)).size()
+    assert(params["param_cache"].get(netspec) == (True,size))
+    cache = ns.paramcache.ParamCache(cachefile)
+    assert(cache.get(netspec) == (True,size))
+    assert(cache.get("\n".join(reversed(netspec.split("\n")))) == (True,size))
+    # a file locked by another process for longer than the timeout does not stop the search
+    cache.db.execute("BEGIN IMMEDIATE")
+    params["param_cache"].db.execute("PRAGMA busy_timeout = 100")
+    params["param_cache"].put("X1 : X1", True, 1)
+    params["param_cache"].flush()
+    assert(params["param_cache"].get("X1 : X1") == (True,1))
+    cache.db.rollback()
+    # and the writes of one process do not hold the lock until its next flush
+    params["param_cache"].put("X1 : (~X1)", False, 0)
+    cache.db.execute("PRAGMA busy_timeout = 100")
+    cache.put("X1 : X1", True, 1)
+    cache.flush()
+    assert(ns.paramcache.ParamCache(cachefile).get("X1 : X1") == (True,1))
+    subprocess.call("rm " + cachefile + "*", shell=True)
+
+def test11():
+    # the per-node parameter estimate agrees with DSGRN
+    for netspec in ['X1 : (X1)(~X3) : E\nX2 : (X1) : E\nX3 : (X1 + X2) : E', 'X1 : (X1)(~X3) : E\nX2 : (~X1) : E\nX3 : (X1 + X2) : E']:
+        graph = gt.getGraphFromNetworkSpec(netspec)
+        assert(ns.paramcount.estimate(graph) == (True,DSGRN.ParameterGraph(DSGRN.Network(netspec)).size()))
+    params = json.load(open("params_X1X2X3_A.json"))
+    params["maxparams"] = 1
+    params, starting_graph = ns.setup(params,open(params["networkfile"]).read())
+    chain = ns.make_filter_chain(params)
+    assert(chain(starting_graph,params) == (None,"Too many params"))
+    assert(chain.statistics()["parameter estimate"]["rejects"] == 1)
+    assert(chain.statistics()["DSGRN computability"]["calls"] == 0)
+
+def test12():
+    # structural limits reject before DSGRN with the usual warning
+    params = json.load(open("params_X1X2X3_A.json"))
+    params["dsgrn_limits"] = {"max_inedges" : 1}
+    params, starting_graph = ns.setup(params,open(params["networkfile"]).read())
+    chain = ns.make_filter_chain(params)
+    assert(chain(starting_graph,params) == (None,"Not computable"))
+    params["dsgrn_limits"] = {"max_inedges" : 2, "max_outedges" : 3, "zero_outedges" : False}
+    assert(chain(starting_graph,params)[1] == "")
+    starting_graph.remove_edge(1,2)
+    assert(chain(starting_graph,params) == (None,"Not computable"))
+    assert(chain.statistics()["DSGRN limits"]["rejects"] == 2)
+    assert(chain.statistics()["parameter estimate"]["calls"] == 1)
+
+def test13():
+    # fingerprints ignore vertex numbering; canonical fingerprints also ignore node labels
+    graph1 = gt.getGraphFromNetworkSpec('X1 : (X1)(~X3) : E\nX2 : (X1) : E\nX3 : (X1 + X2) : E')
+    graph2 = gt.getGraphFromNetworkSpec('X3 : (X1 + X2) : E\nX1 : (X1)(~X3) : E\nX2 : (X1) : E')
+    graph3 = gt.getGraphFromNetworkSpec('Y1 : (Y1)(~Y3) : E\nY2 : (Y1) : E\nY3 : (Y1 + Y2) : E')
+    graph4 = gt.getGraphFromNetworkSpec('X1 : (X1)(~X3) : E\nX2 : (~X1) : E\nX3 : (X1 + X2) : E')
+    assert(ns.fingerprint.fingerprint(graph1) == ns.fingerprint.fingerprint(graph2))
+    assert(ns.fingerprint.fingerprint(graph1) != ns.fingerprint.fingerprint(graph3))
+    assert(ns.fingerprint.canonical_fingerprint(graph1) == ns.fingerprint.canonical_fingerprint(graph3))
+    assert(ns.fingerprint.canonical_fingerprint(graph1) != ns.fingerprint.canonical_fingerprint(graph4))
+    # symmetric graphs are pruned by their automorphisms and stay canonical
+    cycle = "\n".join("X{} : (X{}) : E".format(k, (k+1) % 8) for k in range(8))
+    relabelled = "\n".join("Y{} : (Y{}) : E".format(k, (k+3) % 8) for k in range(8))
+    form = ns.fingerprint.canonical_form(gt.getGraphFromNetworkSpec(cycle))
+    assert(form[0] == 8)
+    assert(form == ns.fingerprint.canonical_form(gt.getGraphFromNetworkSpec(relabelled)))
+    # a search that is cut off does not identify graphs with different labels
+    maxleaves = ns.fingerprint.MAXLEAVES
+    ns.fingerprint.MAXLEAVES = 1
+    try:
+        assert(ns.fingerprint.canonical_fingerprint(graph1) == ns.fingerprint.canonical_fingerprint(graph3))
+        assert(ns.fingerprint.canonical_fingerprint(gt.getGraphFromNetworkSpec(cycle)) !=
+               ns.fingerprint.canonical_fingerprint(gt.getGraphFromNetworkSpec(relabelled)))
+    finally:
+        ns.fingerprint.MAXLEAVES = maxleaves
+    # repeated graphs reuse their verdicts and are counted the same way
+    params = json.load(open("params_X1X2X3_A.json"))
+    params["filters"] = {"is_feed_forward" : {}}
+    params, starting_graph = ns.setup(params,open(params["networkfile"]).read())
+    params["range_operations"] = [0,1]
+    assert(ns.perturb_once(starting_graph,params) is None)
+    assert(ns.perturb_once(starting_graph,params) is None)
+    assert(params["msg_dict"]["Not feed-forward"] == 2)
+    assert(len(params["verdicts"]) == 1)
+
+def test14():
+    # the working graph translates back to the same network and clones do not change the original
+    original = open("networkspec_X1X2X3.txt").read()
+    original_graph = gt.getGraphFromNetworkSpec(original)
+    netspec = gt.createEssentialNetworkSpecFromGraph(original_graph)
+    graph = ns.workgraph.WorkGraph.from_graph(original_graph)
+    assert(gt.createEssentialNetworkSpecFromGraph(graph.to_graph()) == netspec)
+    clone = graph.clone()
+    clone.remove_vertex(clone.get_vertex_from_label("X2"))
+    clone.add_edge(clone.get_vertex_from_label("X3"),clone.get_vertex_from_label("X3"),"a")
+    assert(gt.createEssentialNetworkSpecFromGraph(graph.to_graph()) == netspec)
+    assert(gt.createEssentialNetworkSpecFromGraph(clone.to_graph()) == 'X1 : (X1)(~X3) : E\nX3 : (X1 + X3) : E')
+    assert(graph.num_edges() == 5 and clone.num_edges() == 4)
+    for _ in range(10):
+        g,numedges = ns.removeNodes(graph.clone(),1)
+        assert(numedges == 5 - g.num_edges())
+
+def test15():
+    # graph filters on hand-checked networks
+    cases = [('X1 : (X1)(~X3) : E\nX2 : (X1) : E\nX3 : (X1 + X2) : E', True, True, False),
+             ('X1 : (X1) : E\nX2 : (X1) : E\nX3 : (X1 + X2) : E', True, False, True),
+             ('X1 : (X2) : E\nX2 : (X1) : E\nX3 : (X3) : E', False, False, False),
+             ('X1 :  : E\nX2 : (X1) : E\nX3 : (~X2) : E\nX4 : (X3) : E', True, False, True),
+             ('X1 : (X4) : E\nX2 : (X1) : E\nX3 : (~X2) : E\nX4 : (X3) : E', True, True, False)]
+    for netspec, conn, sconn, ff in cases:
+        graph = gt.getGraphFromNetworkSpec(netspec)
+        for g in [graph, ns.workgraph.WorkGraph.from_graph(graph)]:
+            assert(is_connected(g)[0] == conn)
+            assert(is_strongly_connected(g)[0] == sconn)
+            assert(is_feed_forward(g)[0] == ff)
+    graph = gt.getGraphFromNetworkSpec(cases[0][0])
+    assert(constrained_inedges(graph,{"min_inedges" : 1, "max_inedges" : 2}) == (True,""))
+    assert(constrained_inedges(graph,{"max_inedges" : 1}) == (False,"In-edges not in range"))
+    assert(not is_connected(gt.Graph())[0] and not is_strongly_connected(gt.Graph())[0])
+    # the graph algorithms behind the filters are not filters
+    for name in ["_strongly_connected_components", "strongly_connected_components"]:
+        try:
+            ns.setup({"filters" : {name : {}}, "probabilities" : {"addNode" : 1.0, "addEdge" : 0.0, "removeEdge" : 0.0, "removeNode" : 0.0},
+                      "range_operations" : [1,1], "numneighbors" : 1, "maxparams" : 10}, "X1 : (X1) : E")
+            assert(False)
+        except ValueError as e:
+            assert("not implemented" in str(e))
+
+def test16():
+    # adaptive filter chains move cheap stages that reject often to the front
+    import time
+    def slow(candidate,params):
+        time.sleep(0.001)
+        return ""
+    def fast(candidate,params):
+        return "Rejected" if len(list(candidate.graph.vertices())) > 3 else ""
+    chain = ns.filterchain.FilterChain([ns.filterchain.Stage("slow",slow),ns.filterchain.Stage("fast",fast)],adaptive=True,reorder_every=10)
+    graph = gt.getGraphFromNetworkSpec('X1 : (X1) : E\nX2 : (X1) : E\nX3 : (X2) : E\nX4 : (X3) : E')
+    verdicts = [chain(graph,{}) for _ in range(20)]
+    assert(all(v == (None,"Rejected") for v in verdicts))
+    assert(chain.order() == ["fast","slow"])
+    assert(chain.statistics()["fast"]["rejects"] == 20 and chain.statistics()["slow"]["calls"] == 10)
+    # the default chain keeps the documented order
+    params = json.load(open("params_X1X2X3_B.json"))
+    params, starting_graph = ns.setup(params,open(params["networkfile"]).read())
+    assert(params["filter_chain"].order() == ["DSGRN limits","parameter estimate","DSGRN computability","constrained_inedges","is_strongly_connected"])
+    # the filters of filters.py run on the working graph without translating it
+    candidate = ns.filterchain.Candidate(ns.workgraph.WorkGraph.from_graph(starting_graph))
+    assert(all(stage.check.func is ns.filter_stage for stage in params["filter_chain"].stages[3:]))
+    assert(params["filter_chain"].stages[-1].check(candidate,params) == "" and candidate.translated is None)
+
+def test17():
+    # networks are streamed to networks.jsonl as well as saved to networks.txt
+    from dsgrn_net_gen.results import read_networks
+    job = Job("params_X1X2X3_A.json")
+    job.run()
+    networks = ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read())
+    streamed = [record["network"] for record in read_networks(os.path.join(job.perturbationsdir, "networks.jsonl"))]
+    assert(len(networks) == 10)
+    assert(len(streamed) == len(set(streamed)))
+    assert(set(streamed) == set(networks))
+    subprocess.call("rm -r " + os.path.dirname(job.perturbationsdir), shell=True)
+
+def test18():
+    # a resumed search finds the same networks as an uninterrupted one
+    from dsgrn_net_gen.checkpoint import load
+    for workers in [1, 2]:
+        params = {"random_seed" : 5, "probabilities" : {"addNode" : 0.0, "addEdge" : 0.5, "removeEdge" : 0.5, "removeNode" : 0.0},
+                  "range_operations" : [1,3], "numneighbors" : 8, "maxparams" : 10000, "time_to_wait" : 30,
+                  "workers" : workers, "chunksize" : 5, "checkpoint_interval" : "always"}
+        network_spec = "X1 : (~X3)\nX2 : (X1)\nX3 : (X1)(~X2)"
+        states = []
+        uninterrupted = ns.perturbNetwork(params, network_spec, save_state=states.append)
+        assert(len(states) > 0)
+        # restart from an early checkpoint, saved through JSON
+        state = json.loads(json.dumps(states[0]))
+        resumed = ns.perturbNetwork(params, network_spec, resume=state)
+        assert(set(resumed) == set(uninterrupted))
+        # 0 turns checkpoints off, as it does for a Job
+        states = []
+        ns.perturbNetwork(dict(params, checkpoint_interval=0), network_spec, save_state=states.append)
+        assert(states == [])
+
+    # a resumed job skips finished seeds and removes the checkpoint when done
+    job = Job("params_X1X2X3_A.json")
+    job.params["checkpoint_interval"] = 0.0
+    job.run()
+    networks = ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read())
+    assert(load(job.checkpointfile) is None)
+    stats = json.load(open(os.path.join(job.perturbationsdir, "stats.json")))
+    # the statistics of the seeds finished before the checkpoint are the first line of stats.jsonl, and the seed that
+    # finished after it is searched again
+    earlier = json.dumps({"seed" : "earlier seed"}) + "\n"
+    with open(os.path.join(job.perturbationsdir, "stats.jsonl"), "w") as f:
+        f.write(earlier + json.dumps(stats["seeds"][0]) + "\n")
+    with open(job.checkpointfile, "w") as f:
+        json.dump({"seed_index" : 0, "finished" : [], "stats_offset" : len(earlier)}, f)
+    resumed = Job.resume(os.path.dirname(job.perturbationsdir))
+    resumed.run()
+    renetworks = ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read())
+    assert(set(renetworks) == set(networks))
+    restats = json.load(open(os.path.join(job.perturbationsdir, "stats.json")))
+    assert([s["seed"] for s in restats["seeds"]] == ["earlier seed"] + [s["seed"] for s in stats["seeds"]])
+    assert(not os.path.exists(job.checkpointfile))
+    assert(not os.path.exists(os.path.join(job.perturbationsdir, "stats.jsonl")))
+    # checkpoints of a job refer to the networks of the finished seeds by the length of networks.jsonl
+    from dsgrn_net_gen.results import read_networks
+    jsonl = os.path.join(job.perturbationsdir, "networks.jsonl")
+    end = sum(len(line) for line in open(jsonl, "rb").readlines()[:3])
+    assert([r["network"] for r in read_networks(jsonl, end)] == [r["network"] for r in read_networks(jsonl)][:3])
+    with open(job.checkpointfile, "w") as f:
+        json.dump({"seed_index" : 1, "networks_offset" : end}, f)
+    Job.resume(os.path.dirname(job.perturbationsdir)).run()
+    renetworks = ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read())
+    assert(sorted(renetworks) == sorted(r["network"] for r in read_networks(jsonl, end)))
+    subprocess.call("rm -r " + os.path.dirname(job.perturbationsdir), shell=True)
+
+def test19():
+    # seeds share one budget and one set of networks, and productive seeds get more perturbations
+    from dsgrn_net_gen.scheduler import perturbSeeds, schedule, Seed, MIN_SHARE
+    params = {"random_seed" : 3, "probabilities" : {"addNode" : 0.0, "addEdge" : 0.5, "removeEdge" : 0.5, "removeNode" : 0.0},
+              "range_operations" : [1,3], "numneighbors" : 12, "maxparams" : 10000, "time_to_wait" : 30, "chunksize" : 5}
+    seeds = ["X1 : (~X3)\nX2 : (X1)\nX3 : (X1)(~X2)", "X1 : (X2)\nX2 : (X1)", "X1 : (~X3)\nX2 : (X1)\nX3 : (X1)(~X2)"]
+    found = []
+    for workers in [1, 2]:
+        params["workers"] = workers
+        networks = perturbSeeds(params, seeds)
+        assert(len(networks) == 12)
+        assert(len(networks) == len(set(networks)))
+        found.append(set(networks))
+    # reproducible for a fixed random seed and number of workers
+    assert(set(perturbSeeds(dict(params, workers=1), seeds)) == found[0])
+    assert(set(perturbSeeds(dict(params, workers=2), seeds)) == found[1])
+    # only sampling is scheduled across seeds
+    for mode in ["enumerate", "walk"]:
+        try:
+            perturbSeeds(dict(params, mode=mode), seeds)
+            assert(False)
+        except ValueError as e:
+            assert("not supported" in str(e))
+
+    exhausted, productive = Seed(0, None), Seed(1, None)
+    exhausted.rate, productive.rate = 0.0, 0.5
+    runs = [schedule([exhausted, productive], 1)[0].index for _ in range(200)]
+    assert(runs.count(0) > 0)
+    assert(runs.count(0) < 2*MIN_SHARE*runs.count(1))
+
+def test20():
+    # the Job writes the timers, the filter statistics and the timeline of each seed to stats.json
+    job = Job("params_X1X2X3_A.json")
+    job.params["workers"] = 2
+    job.params["chunksize"] = 5
+    job.run()
+    stats = json.load(open(os.path.join(job.perturbationsdir, "stats.json")))
+    subprocess.call("rm -r " + os.path.dirname(job.perturbationsdir), shell=True)
+    assert(len(stats["seeds"]) == 1)
+    stats = stats["seeds"][0]
+    assert(stats["accepted"] == 10)
+    assert(stats["perturbed"] >= 9)
+    assert(stats["timers"]["perform_operations"]["calls"] == stats["perturbed"])
+    for name in ["createEssentialNetworkSpecFromGraph", "DSGRN.Network", "DSGRN.ParameterGraph"]:
+        assert(stats["timers"][name]["calls"] > 0)
+    # graphs seen before reuse their verdict and skip the checks
+    assert(stats["stages"]["DSGRN limits"]["calls"] + stats["warnings"]["Aborted"] <= stats["perturbed"])
+    assert(stats["timeline"][-1][1:] == [stats["perturbed"], stats["accepted"]])
+
+def test21():
+    # enumeration finds every network that random sampling finds, checking each graph once
+    from dsgrn_net_gen.workgraph import WorkGraph
+    from dsgrn_net_gen.enumeration import neighbors, allowed_operations
+    from dsgrn_net_gen.fingerprint import fingerprint
+    network_spec = "X1 : (X1)(~X3)\nX2 : X1\nX3 : X1 + X2"
+    params = {"random_seed" : 0, "probabilities" : {"addNode" : 0.5, "addEdge" : 0.5, "removeEdge" : 0.0, "removeNode" : 0.0},
+              "range_operations" : [1,2], "numneighbors" : 10**6, "maxparams" : 10**6, "time_to_wait" : 60,
+              "nodelist" : parseNodeFile("nodefile_X1X2X3.txt"), "edgelist" : parseEdgeFile("edgefile_X1X2X3.txt"),
+              "filters" : {"constrained_inedges" : {"max_inedges" : 2}}, "DSGRN_optimized" : False}
+    enumerated = ns.perturbNetwork(dict(params, mode="enumerate"), network_spec)
+    assert(set(enumerated) == set(ns.perturbNetwork(dict(params, mode="enumerate"), network_spec)))
+    sampled = ns.perturbNetwork(dict(params, numneighbors=len(enumerated), time_to_wait=3), network_spec)
+    assert(set(sampled).issubset(enumerated))
+    # the one-operation neighborhood of the seed
+    ps = ns.make_probability_vector(params["probabilities"])
+    graph = WorkGraph.from_graph(gt.getGraphFromNetworkSpec(network_spec))
+    setup_params, _ = ns.setup(dict(params), network_spec)
+    first = list(neighbors(graph, setup_params, allowed_operations(ps)))
+    # nodes X4 and X5 can be added, and the edges X2 -> X2, X3 -> X2 (either sign) and X3 -> X3 of the edge file;
+    # X1 -> X2 is already an activating edge, so it cannot also be repressing
+    assert(len(first) == 2 + 4)
+    assert(len(set(fingerprint(g) for g in first)) == len(first))
+    try:
+        ns.perturbNetwork(dict(params, mode="exhaustive"), network_spec)
+        assert(False)
+    except ValueError:
+        pass
+
+def test22():
+    # a saturated neighborhood ends the search early with a reason
+    from dsgrn_net_gen.stopping import StoppingRule
+    rule = StoppingRule(window=10, min_rate=0.01, min_perturbed=5)
+    seen = set()
+    for k, netspec in enumerate(["a", "b", "b", "c", "c", "c"]):
+        rule.accept(netspec, netspec not in seen, k + 1)
+        seen.add(netspec)
+    assert((rule.singletons, rule.doubletons) == (1, 1))
+    assert(rule.estimated_size() == 3 + 1/2)
+    assert(rule.check(6) == "")
+    assert(rule.check(16).startswith("No new networks in the last"))
+
+    network_spec = "X1 : (X1)(~X2)\nX2 : (X1)"
+    params = {"random_seed" : 2, "probabilities" : {"addNode" : 0.0, "addEdge" : 1.0, "removeEdge" : 0.0, "removeNode" : 0.0},
+              "range_operations" : [1,1], "numneighbors" : 1000, "maxparams" : 10**6, "time_to_wait" : 30,
+              "early_stop" : {"window" : 300, "min_perturbed" : 100}}
+    for workers in [1, 2]:
+        stats = {}
+        networks = ns.perturbNetwork(dict(params, workers=workers, chunksize=20), network_spec, stats=stats)
+        assert(stats["elapsed"] < 30)
+        assert(stats["stop_reason"].split(" (")[0] in ["No new networks in the last {} perturbations".format(n) for n in range(300, 400)]
+               or stats["stop_reason"].startswith("Estimated probability"))
+        # a search resumed from a checkpoint stops at the same point
+        states, resumed = [], {}
+        ns.perturbNetwork(dict(params, workers=workers, chunksize=20, checkpoint_interval="always"), network_spec,
+                          save_state=states.append)
+        ns.perturbNetwork(dict(params, workers=workers, chunksize=20), network_spec,
+                          resume=json.loads(json.dumps(states[len(states)//2])), stats=resumed)
+        assert((resumed["perturbed"], resumed["stop_reason"]) == (stats["perturbed"], stats["stop_reason"]))
+    saved = StoppingRule.from_json(json.loads(json.dumps(rule.to_json())), window=10, min_perturbed=5)
+    assert((saved.found, saved.singletons, saved.doubletons, saved.last_new) == (rule.found, rule.singletons, rule.doubletons, rule.last_new))
+    stats = {}
+    ns.perturbNetwork(dict(params, early_stop=False, numneighbors=1), network_spec, stats=stats)
+    assert(stats["stop_reason"] == "Found numneighbors networks")
+
+def test23():
+    # edges are drawn from an index of the edge list, so large edge lists stay cheap and draws stay reproducible
+    from dsgrn_net_gen.candidates import EdgeIndex, draw
+    index = EdgeIndex([("X1","X2","a"), ("X2","X1","r"), ("X1","X3","a"), ("X3","X3","a"), ("X2","X1","r")])
+    assert(index.pool(["X1","X2"]) == [("X1","X2","a"), ("X2","X1","r")])
+    assert(index.inedges("X3") == [("X1","X3","a"), ("X3","X3","a")])
+    assert(draw(index.edges, lambda e: e[1] == "X3" and e[0] == "X3") == ("X3","X3","a"))
+    assert(draw(index.edges, lambda e: False) is None)
+
+    nodes = ["X{}".format(k) for k in range(1, 121)]
+    edgelist = [(u, v, r) for u in nodes for v in nodes for r in "ar" if not (u == v and r == "r")]
+    params = {"random_seed" : 11, "probabilities" : {"addNode" : 0.3, "addEdge" : 0.5, "removeEdge" : 0.1, "removeNode" : 0.1},
+              "range_operations" : [1,4], "numneighbors" : 20, "maxparams" : 10**6, "time_to_wait" : 30,
+              "nodelist" : nodes, "edgelist" : edgelist}
+    network_spec = "X1 : (X1)(~X3)\nX2 : X1\nX3 : X1 + X2"
+    networks = ns.perturbNetwork(params, network_spec)
+    assert(len(networks) == 20)
+    assert(set(networks) == set(ns.perturbNetwork(dict(params, nodelist=nodes[::-1], edgelist=edgelist[::-1]), network_spec)))
+    allowed = set(edgelist)
+    for netspec in networks:
+        g = gt.getGraphFromNetworkSpec(netspec)
+        for (u, v) in g.edges():
+            assert((g.vertex_label(u), g.vertex_label(v), g.edge_label(u, v)) in allowed)
+
+def test24():
+    # the numpy sampler draws operation counts in batches, reproducibly for a fixed seed
+    from dsgrn_net_gen import sampling
+    network_spec = "X1 : (X1)(~X3)\nX2 : X1\nX3 : X1 + X2"
+    params = {"random_seed" : 4, "probabilities" : {"addNode" : 0.0, "addEdge" : 0.6, "removeEdge" : 0.4, "removeNode" : 0.0},
+              "range_operations" : [1,3], "numneighbors" : 10, "maxparams" : 10**6, "time_to_wait" : 30, "sampler" : "numpy"}
+    if sampling.numpy is None:
+        try:
+            ns.perturbNetwork(params, network_spec)
+            assert(False)
+        except ValueError:
+            pass
+        return
+    import random
+    sampler = sampling.OperationSampler([1,4], ns.make_probability_vector(params["probabilities"]), batchsize=7)
+    random.seed(0)
+    draws = [sampler() for _ in range(20)]
+    assert(all(1 <= sum(ops) <= 3 and ops[0] == ops[3] == 0 for ops in draws))
+    random.seed(0)
+    sampler.reset()
+    assert([sampler() for _ in range(20)] == draws)
+    networks = ns.perturbNetwork(params, network_spec)
+    assert(len(networks) == 10)
+    assert(set(networks) == set(ns.perturbNetwork(params, network_spec)))
+    assert(set(ns.perturbNetwork(dict(params, workers=2), network_spec)) ==
+           set(ns.perturbNetwork(dict(params, workers=2), network_spec)))
+
+def test25():
+    # parsed edge and node files are cached until the file changes
+    import os
+    cachedir = "temp_results/parse_cache"
+    edgelist = parseEdgeFile("edgefile_X1X2X3.txt")
+    nodelist = parseNodeFile("nodefile_X1X2X3.txt")
+    assert(parseEdgeFile("edgefile_X1X2X3.txt", cachedir) == edgelist)
+    assert(parseNodeFile("nodefile_X1X2X3.txt", cachedir) == nodelist)
+    assert(len(os.listdir(cachedir)) == 2)
+    assert(parseEdgeFile("edgefile_X1X2X3.txt", cachedir) == edgelist)
+    fname = "temp_results/edgefile_changing.txt"
+    with open(fname, "w") as f:
+        f.write("# target = reg(source)\nX1 = a(X2), 0.9\n\nX2 = r(X1)\n")
+    assert(parseEdgeFile(fname, cachedir) == [("X2","X1","a"), ("X1","X2","r")])
+    with open(fname, "a") as f:
+        f.write("X3 = a(X3)\n")
+    assert(parseEdgeFile(fname, cachedir) == [("X2","X1","a"), ("X1","X2","r"), ("X3","X3","a")])
+    os.remove(fname)
+    shutil.rmtree(cachedir)
+
+def test26():
+    # seed networks are read from a single spec, a list, or one JSON record per line
+    spec = open("networkspec_X1X2X3.txt").read().rstrip("\n")
+    assert(list(iterNetworkFile("networkspec_X1X2X3.txt")) == [spec])
+    fname = "temp_results/seeds.jsonl"
+    for contents, seeds in [("", [""]), ("[]\n", [""]), (str([spec, "X1 : X1"]), [spec, "X1 : X1"]),
+                            (json.dumps(spec) + "\n\n" + json.dumps({"network" : "X1 : X1", "params" : 3}) + "\n", [spec, "X1 : X1"])]:
+        with open(fname, "w") as f:
+            f.write(contents)
+        assert(list(iterNetworkFile(fname)) == seeds)
+    # a malformed later record does not delay the first seed
+    with open(fname, "a") as f:
+        f.write("{\n")
+    seeds = iterNetworkFile(fname)
+    assert(next(seeds) == spec)
+    try:
+        list(seeds)
+        assert(False)
+    except ValueError:
+        pass
+    os.remove(fname)
+
+def test27():
+    # the Job records the accepted networks and their metadata in networks.db
+    from dsgrn_net_gen.results import query_networks
+    for workers in [1, 2]:
+        job = Job("params_X1X2X3_A.json")
+        job.params["workers"] = workers
+        job.params["results_db"] = True
+        job.run()
+        networks = ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read())
+        dbfile = os.path.join(job.perturbationsdir, "networks.db")
+        records = list(query_networks(dbfile))
+        assert(set(r["network"] for r in records) == set(networks) and len(records) == len(networks))
+        seed = open("networkspec_X1X2X3.txt").read().rstrip("\n")
+        for r in records:
+            graph = gt.getGraphFromNetworkSpec(r["network"])
+            assert(r["params"] == DSGRN.ParameterGraph(DSGRN.Network(r["network"])).size())
+            assert((r["nodes"], r["edges"]) == (len(graph.vertices()), len(graph.edges())))
+            assert(r["seed"] == seed)
+            assert(r["remove_nodes"] == r["remove_edges"] == 0 and 0 <= r["add_nodes"] + r["add_edges"] <= 3)
+        small = sorted(r["network"] for r in query_networks(dbfile, max_params=1000, nodes=4))
+        assert(small == sorted(r["network"] for r in records if r["params"] <= 1000 and r["nodes"] == 4))
+        subprocess.call("rm -r " + os.path.dirname(job.perturbationsdir), shell=True)
+
+def test28():
+    # shards of a job run as separate processes and their results are merged without duplicates
+    from dsgrn_net_gen.sharding import make_shards, merge_shards
+    seeds = ["X1 : (X1)(~X3)\nX2 : X1\nX3 : X1 + X2", "X1 : (~X3)\nX2 : (X1)\nX3 : (X1)(~X2)", "X1 : X2\nX2 : X1"]
+    with open("temp_results/seeds.txt", "w") as f:
+        f.write(str(seeds))
+    params = json.load(open("params_X1X2X3_A.json"))
+    params["networkfile"] = "temp_results/seeds.txt"
+    del params["datetime"]
+    json.dump(params, open("temp_results/params_shards.json", "w"))
+    shardsdir = "temp_results/shards"
+    paramfiles = make_shards("temp_results/params_shards.json", 2, shardsdir)
+    shards = [json.load(open(pf)) for pf in paramfiles]
+    assert([list(iterNetworkFile(shard["networkfile"])) for shard in shards] == [seeds[0::2], seeds[1::2]])
+    assert(shards[0]["random_seed"] != shards[1]["random_seed"] and shards[0]["numneighbors"] == params["numneighbors"])
+    jobs = [subprocess.Popen([sys.executable, "../call_job.py", pf], stdout=subprocess.DEVNULL) for pf in paramfiles]
+    assert(all(job.wait() == 0 for job in jobs))
+    stats = merge_shards(shardsdir)
+    merged = ast.literal_eval(open(os.path.join(shardsdir, "merged", "networks.txt")).read())
+    found = []
+    for networksdir in stats["shards"]:
+        found.extend(ast.literal_eval(open(os.path.join(networksdir, "networks.txt")).read()))
+    assert(len(stats["shards"]) == 2 and sorted(merged) == sorted(set(found)))
+    assert(stats["networks"] + stats["duplicates"] == len(found))
+    assert(stats["accepted"] == len(found) and stats["perturbed"] >= stats["accepted"])
+    # a single seed is shared by the shards, which divide its budget
+    params["networkfile"] = "networkspec_X1X2X3.txt"
+    json.dump(params, open("temp_results/params_shards.json", "w"))
+    shards = [json.load(open(pf)) for pf in make_shards("temp_results/params_shards.json", 3, "temp_results/shards1")]
+    assert([shard["numneighbors"] for shard in shards] == [4, 4, 4])
+    shutil.rmtree(shardsdir)
+    shutil.rmtree("temp_results/shards1")
+    os.remove("temp_results/seeds.txt")
+    os.remove("temp_results/params_shards.json")
+
+def test29():
+    # supervised evaluation gives the same networks, and candidates over the limits are counted and skipped
+    from dsgrn_net_gen.supervisor import SupervisedEvaluator
+    network_spec = "Y1 : (Y1)(~Y3)\nY2 : Y1\nY3 : Y1 + Y2"
+    params = {"random_seed" : 7, "probabilities" : {"addNode" : 0.0, "addEdge" : 0.6, "removeEdge" : 0.4, "removeNode" : 0.0},
+              "range_operations" : [1,3], "numneighbors" : 10, "maxparams" : 10**6, "time_to_wait" : 30}
+    stats = {}
+    networks = ns.perturbNetwork(dict(params, eval_max_rss=1, time_to_wait=2), network_spec, stats=stats)
+    assert(networks == [] and stats["warnings"]["Evaluation timeout"] > 0)
+    assert(set(ns.perturbNetwork(dict(params, eval_timeout=60), network_spec)) == set(ns.perturbNetwork(params, network_spec)))
+    evaluator = SupervisedEvaluator(timeout=60)
+    expected = ns.paramgraph_size(network_spec)
+    assert(evaluator(network_spec) == expected)
+    # a child that died between candidates is restarted
+    evaluator.process.kill()
+    evaluator.process.wait()
+    assert(evaluator(network_spec) == expected)
+    evaluator.close()
+    evaluator = SupervisedEvaluator(max_rss=1)
+    assert(evaluator(network_spec) is None and evaluator.restarts == 1)
+    assert(evaluator.process is None)
+
+def test30():
+    # fingerprint sets grow and spilled network sets give the same search results
+    from dsgrn_net_gen.dedup import FingerprintSet, NetworkSet
+    from dsgrn_net_gen.fingerprint import digest
+    keys = [digest(str(k)) for k in range(5000)]
+    fps = FingerprintSet(capacity=4)
+    assert(all(fps.add(k) for k in keys) and not any(fps.add(k) for k in keys))
+    assert(len(fps) == 5000 and all(k in fps for k in keys) and digest("5000") not in fps)
+    spilled = NetworkSet("temp_results")
+    spilled.update(["X1 : X1", "X1 : X2\nX2 : X1", "X1 : X1"])
+    assert(list(spilled) == ["X1 : X1", "X1 : X2\nX2 : X1"] and len(spilled) == 2 and "X1 : X1" in spilled)
+    spilled.close()
+    # a checkpoint holds the file and length of a kept set, and the restored set continues from there
+    spilled = NetworkSet("temp_results", keep=True)
+    spilled.add("X1 : X1")
+    saved = ns.dedup.to_json(spilled)
+    spilled.add("X1 : X2\nX2 : X1")
+    restored = NetworkSet.restore(json.loads(json.dumps(saved)))
+    assert(list(restored) == ["X1 : X1"] and "X1 : X2\nX2 : X1" not in restored)
+    restored.add("X1 : (~X1)")
+    assert(list(restored) == ["X1 : X1", "X1 : (~X1)"])
+    restored.close()
+    assert(not os.path.exists(saved["spill_file"]))
+    network_spec = "X1 : (~X3)\nX2 : (X1)\nX3 : (X1)(~X2)"
+    for workers in [1, 2]:
+        params = {"random_seed" : 5, "probabilities" : {"addNode" : 0.0, "addEdge" : 0.5, "removeEdge" : 0.5, "removeNode" : 0.0},
+                  "range_operations" : [1,3], "numneighbors" : 8, "maxparams" : 10000, "time_to_wait" : 30,
+                  "workers" : workers, "chunksize" : 5}
+        networks = ns.perturbNetwork(params, network_spec)
+        spilled = ns.perturbNetwork(dict(params, spill_networks=True), network_spec)
+        assert(isinstance(spilled, NetworkSet) and sorted(spilled) == sorted(networks))
+        # checkpoints of a spilled search hold its file instead of the networks and resume the same way
+        states = []
+        spilled = ns.perturbNetwork(dict(params, spill_networks=True, spill_dir="temp_results", checkpoint_interval="always"),
+                                    network_spec, save_state=states.append)
+        assert(sorted(spilled) == sorted(networks))
+        assert(all(set(state["networks"]) == {"spill_file", "offset"} for state in states))
+        resumed = ns.perturbNetwork(dict(params, spill_networks=True, spill_dir="temp_results"), network_spec, resume=states[0])
+        assert(sorted(resumed) == sorted(networks))
+        resumed.close()
+    job = Job("params_X1X2X3_A.json")
+    job.params["spill_networks"] = True
+    job.run()
+    networks = ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read())
+    assert(len(networks) == len(set(networks)) == 10)
+    # the spill files are removed
+    assert(sorted(os.listdir(job.perturbationsdir)) == ["networks.jsonl", "networks.txt", "stats.json"])
+    # a resumed job reads the networks of the finished seeds back from the spill file of its checkpoint
+    finished = NetworkSet(job.perturbationsdir, keep=True)
+    finished.update(networks)
+    with open(job.checkpointfile, "w") as f:
+        json.dump({"seed_index" : 1, "finished" : ns.dedup.to_json(finished)}, f)
+    Job.resume(os.path.dirname(job.perturbationsdir)).run()
+    assert(ast.literal_eval(open(os.path.join(job.perturbationsdir, "networks.txt")).read()) == networks)
+    assert(not os.path.exists(finished.file.name))
+    subprocess.call("rm -r " + os.path.dirname(job.perturbationsdir), shell=True)
+
+def test31():
+    # the job server runs jobs sent by the thin client at the same time and answers with their results
+    import tempfile, threading
+    from dsgrn_net_gen.server import JobServer
+    params = json.load(open("params_X1X2X3_A.json"))
+    del params["datetime"]
+    json.dump(params, open("temp_results/params_server.json", "w"))
+    socketpath = os.path.join(tempfile.mkdtemp(), "jobs.sock")
+    server = JobServer(socketpath, workers=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        client = [sys.executable, "../submit_job.py", "--socket", socketpath]
+        jobs = [subprocess.Popen(client + ["temp_results/params_server.json"], stdout=subprocess.PIPE, universal_newlines=True)
+                for _ in range(3)]
+        replies = [dict(line.split(" : ") for line in job.communicate()[0].splitlines()) for job in jobs]
+        assert(all(job.returncode == 0 for job in jobs))
+        assert(len(set(reply["resultsdir"] for reply in replies)) == 3)
+        for reply in replies:
+            assert(len(ast.literal_eval(open(reply["networks"]).read())) == 10)
+            assert("Network search complete." in open(os.path.join(reply["resultsdir"], "job.log")).read())
+            shutil.rmtree(reply["resultsdir"])
+        failed = subprocess.run(client + ["temp_results/missing.json"], stderr=subprocess.PIPE, universal_newlines=True)
+        assert(failed.returncode != 0 and "FileNotFoundError" in failed.stderr)
+    finally:
+        subprocess.run(client + ["--shutdown"], stdout=subprocess.DEVNULL)
+        thread.join()
+        server.server_close()
+        os.remove("temp_results/params_server.json")
+    assert(not os.path.exists(socketpath))
+
+def test32():
+    # walks reach networks farther from the seed than range_operations, but not farther than walk_max_distance
+    from dsgrn_net_gen.walk import labelled, distance
+    params = json.load(open("params_X1X2X3_A.json"))
+    network_spec = open(params["networkfile"]).read()
+    params.update({"edgelist" : parseEdgeFile(params["edgefile"]), "nodelist" : parseNodeFile(params["nodefile"]),
+                   "mode" : "walk", "range_operations" : [1,1], "walk_max_distance" : 4, "numneighbors" : 30,
+                   "random_seed" : 3, "probabilities" : {"addNode" : 0.3, "addEdge" : 0.4, "removeEdge" : 0.3, "removeNode" : 0.0}})
+    stats = {}
+    networks = ns.perturbNetwork(params, network_spec, stats=stats)
+    assert(set(networks) == set(ns.perturbNetwork(params, network_spec)))
+    seed = labelled(gt.getGraphFromNetworkSpec(network_spec))
+    distances = [distance(seed, labelled(gt.getGraphFromNetworkSpec(netspec))) for netspec in networks]
+    assert(max(distances) <= 4 and max(distances) > 1)
+    assert(len(networks) == 30 and stats["warnings"]["Too far from seed"] > 0)
+
+def test33():
+    # many short searches with worker processes all finish, including ones that stop while chunks are running
+    params = {"probabilities" : {"addNode" : 0.0, "addEdge" : 0.5, "removeEdge" : 0.5, "removeNode" : 0.0},
+              "range_operations" : [1,3], "numneighbors" : 3, "maxparams" : 10000, "time_to_wait" : 30,
+              "workers" : 2, "chunksize" : 2}
+    network_spec = "X1 : (~X3)\nX2 : (X1)\nX3 : (X1)(~X2)"
+    for k in range(30):
+        assert(len(ns.perturbNetwork(dict(params, random_seed=k), network_spec)) == 3)
+
 if __name__ == "__main__":
     test3()
\ No newline at end of file